@@ -0,0 +1,115 @@
+import json
+import platform
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+
+from benchmarks.suite import REGRESSION_THRESHOLD, BenchmarkError, build_scenarios, compare, run
+
+
+class Command(BaseCommand):
+    help = ('Seed a fixed dataset into a new test database, request every blog URL with the test '
+            'client and report latency percentiles, queries per request and peak memory.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', action='append', default=[], metavar='SCENARIO',
+                            help='Run only this scenario, may be repeated')
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Keep the page cache between requests instead of clearing it')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare with the JSON results of an earlier run')
+        parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                            help='Allowed slowdown as a fraction of the baseline, 0.2 is 20%%')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Seed the configured database inside a transaction that is '
+                                 'rolled back, instead of creating a test database')
+
+    def seed(self, options):
+        call_command('seed_blog', users=options['users'], tags=options['tags'], posts=options['posts'],
+                     comments=options['comments'], seed=options['seed'], index=True, stdout=StringIO())
+
+    def benchmark(self, options):
+        self.seed(options)
+        scenarios = build_scenarios()
+        if options['only']:
+            unknown = set(options['only']) - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError('Unknown scenarios: {}'.format(', '.join(sorted(unknown))))
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['only']]
+        return run(scenarios, options['iterations'], options['warmup'], not options['warm_cache'])
+
+    def run_isolated(self, options):
+        if options['current_db']:
+            with transaction.atomic():
+                results = self.benchmark(options)
+                transaction.set_rollback(True)
+            return results
+
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            return self.benchmark(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['results']
+
+        try:
+            setup_test_environment(debug=False)
+            environment = True
+        except RuntimeError:
+            # Already set up by the test runner.
+            environment = False
+        try:
+            with override_settings(CACHES=settings.BLOG_ISOLATED_CACHES):
+                results = self.run_isolated(options)
+        except BenchmarkError as e:
+            raise CommandError(e)
+        finally:
+            if environment:
+                teardown_test_environment()
+
+        self.stdout.write('{:<16} {:>9} {:>9} {:>9} {:>8} {:>10}'.format(
+            'scenario', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'peak KiB'))
+        for name, result in results.items():
+            self.stdout.write('{:<16} {:>9.2f} {:>9.2f} {:>9.2f} {:>8} {:>10.1f}'.format(
+                name, result['p50_ms'], result['p95_ms'], result['p99_ms'],
+                result['queries'], result['peak_memory_kb']))
+
+        if options['output']:
+            meta = {key: options[key] for key in ('users', 'tags', 'posts', 'comments', 'seed',
+                                                  'iterations', 'warmup', 'warm_cache')}
+            meta.update(python=platform.python_version(), django=django.get_version(),
+                        database=connection.vendor)
+            with open(options['output'], 'w') as f:
+                json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+        if baseline is not None:
+            regressions = compare(baseline, results, options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write('REGRESSION ' + regression)
+                raise CommandError('{} metrics regressed by more than {:.0%}'.format(
+                    len(regressions), options['threshold']))
+            self.stdout.write(self.style.SUCCESS('No regressions against {}'.format(options['baseline'])))
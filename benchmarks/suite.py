@@ -0,0 +1,141 @@
+import gc
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Post, Tag
+
+
+PERCENTILES = (50, 95, 99)
+TIMING_METRICS = tuple('p{}_ms'.format(p) for p in PERCENTILES)
+# A metric regresses when it grows by more than this fraction of the baseline.
+REGRESSION_THRESHOLD = 0.2
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Scenario:
+
+    def __init__(self, name, url, method='get', data=None, user=None, status=200):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.data = data
+        self.user = user
+        self.status = status
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user)
+
+    def request(self):
+        response = getattr(self.client, self.method)(self.url, self.data)
+        if response.status_code != self.status:
+            raise BenchmarkError('{} {} returned {}, expected {}'.format(
+                self.method.upper(), self.url, response.status_code, self.status))
+        return response
+
+
+def build_scenarios():
+    # The busiest objects of the dataset, so long comment threads and
+    # crowded tags are what gets measured.
+    post = (Post.objects.filter(published=True).select_related('author')
+            .order_by('-comment_count', 'pk').first())
+    tags = list(Tag.objects.order_by('-post_count', 'pk')[:2])
+    if post is None or len(tags) < 2:
+        raise BenchmarkError('The dataset needs a published post and two tags')
+    author = post.author
+    staff, _ = get_user_model().objects.get_or_create(username='benchmark-staff', defaults={'is_staff': True})
+    word = post.title.split()[0]
+
+    return [
+        Scenario('home', reverse('home')),
+        Scenario('home_page_2', reverse('home') + '?page=2'),
+        Scenario('home_popular', reverse('home') + '?order=popular'),
+        Scenario('search', reverse('home') + '?search=' + word),
+        Scenario('posts_by_author', reverse('posts_by_author', args=[author.username])),
+        Scenario('tag_list', reverse('tag_list')),
+        Scenario('tag_detail', reverse('tag_detail', args=[tags[0].slug])),
+        Scenario('tag_detail_all', reverse('tag_detail', args=['+'.join(sorted(tag.slug for tag in tags))])),
+        Scenario('post_detail', post.get_absolute_url()),
+        Scenario('post_comments', reverse('post_comments', args=[post.slug])),
+        Scenario('post_new', reverse('post_new'), user=author),
+        Scenario('post_edit', reverse('post_edit', args=[post.slug]), user=author),
+        Scenario('post_delete', reverse('post_delete', args=[post.slug]), user=author),
+        Scenario('tag_new', reverse('tag_new'), user=author),
+        Scenario('tag_edit', reverse('tag_edit', args=[tags[0].slug]), user=staff),
+        Scenario('tag_delete', reverse('tag_delete', args=[tags[0].slug]), user=staff),
+        # Last, every request adds a comment to the measured post.
+        Scenario('comment_post', post.get_absolute_url(), method='post', status=302,
+                 data={'name': 'Benchmark', 'email': 'benchmark@example.com', 'body': 'Benchmark comment'}),
+    ]
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(int(round(len(values) * percent / 100.0)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def measure(scenario, iterations, warmup, cold_cache=True):
+    # With cold_cache the page cache is cleared before every request, so
+    # anonymous pages are rendered instead of served from the cache.
+    for _ in range(warmup):
+        scenario.request()
+
+    gc.collect()
+    timings, queries = [], []
+    for _ in range(iterations):
+        if cold_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            scenario.request()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+
+    # tracemalloc slows everything down, so memory gets a request of its own.
+    if cold_cache:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        scenario.request()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {'method': scenario.method.upper(), 'url': scenario.url, 'iterations': iterations}
+    for percent, metric in zip(PERCENTILES, TIMING_METRICS):
+        result[metric] = round(percentile(timings, percent), 3)
+    result['mean_ms'] = round(statistics.mean(timings), 3)
+    result['queries'] = int(statistics.median(queries))
+    result['peak_memory_kb'] = round(peak / 1024.0, 1)
+    return result
+
+
+def run(scenarios, iterations, warmup, cold_cache=True):
+    return {scenario.name: measure(scenario, iterations, warmup, cold_cache) for scenario in scenarios}
+
+
+def compare(baseline, results, threshold=REGRESSION_THRESHOLD):
+    # Scenarios that are missing on either side are skipped. Query counts
+    # are exact, so any extra query is a regression.
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in TIMING_METRICS + ('peak_memory_kb',):
+            if metric in base and result[metric] > base[metric] * (1 + threshold):
+                regressions.append('{} {}: {} -> {}'.format(name, metric, base[metric], result[metric]))
+        if 'queries' in base and result['queries'] > base['queries']:
+            regressions.append('{} queries: {} -> {}'.format(name, base['queries'], result['queries']))
+    return regressions
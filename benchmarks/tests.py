@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from blog.models import Comment, Post
+
+from .suite import compare, percentile
+
+
+class CompareTests(TestCase):
+
+    def setUp(self):
+        self.baseline = {'home': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30,
+                                  'queries': 5, 'peak_memory_kb': 100}}
+
+    def result(self, **changes):
+        result = dict(self.baseline['home'], **changes)
+        return {'home': result, 'new': result}
+
+    def test_within_threshold(self):
+        self.assertEqual(compare(self.baseline, self.result(p95_ms=23, peak_memory_kb=110), 0.2), [])
+
+    def test_slower_timings_and_extra_queries(self):
+        self.assertEqual(compare(self.baseline, self.result(p99_ms=40, queries=6), 0.2),
+                         ['home p99_ms: 30 -> 40', 'home queries: 5 -> 6'])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+
+class RunBenchmarksTests(TestCase):
+
+    def run_benchmarks(self, **options):
+        call_command('run_benchmarks', current_db=True, users=3, tags=5, posts=20, comments=50,
+                     iterations=2, warmup=0, stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_writes_results_and_rolls_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            self.run_benchmarks(output=output)
+            with open(output) as f:
+                data = json.load(f)
+
+        self.assertEqual(data['meta']['posts'], 20)
+        self.assertEqual(data['results']['comment_post']['method'], 'POST')
+        for name in ('home', 'post_detail', 'tag_detail', 'search', 'comment_post'):
+            self.assertLessEqual({'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_memory_kb'},
+                                 set(data['results'][name]))
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            with open(baseline, 'w') as f:
+                json.dump({'results': {'home': {'queries': 0}}}, f)
+            with self.assertRaisesMessage(CommandError, '1 metrics regressed'):
+                self.run_benchmarks(only=['home'], baseline=baseline)
+
+    def test_shared_cache_is_left_alone(self):
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {'default': {'BACKEND': 'blog.cache.AtomicFileBasedCache', 'LOCATION': directory}}
+            with override_settings(CACHES=shared):
+                self.run_benchmarks(only=['home'])
+            self.assertEqual(os.listdir(directory), [])
@@ -7,7 +7,7 @@ from django.utils.text import Truncator
 
 class CommentInline(admin.TabularInline):
     model = Comment
-    exclude = ['email', 'author_status', 'created']
+    exclude = ['email', 'author_status', 'created', 'parent']
     extra = 1
 
     formfield_overrides = {
@@ -42,6 +42,14 @@ class CommentAdmin(admin.ModelAdmin):
                     'active')
     list_filter = ('active', 'post', 'name')
     list_editable = ('active',)
+    raw_id_fields = ('parent',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # The materialized path is only set when a comment is created, so an
+        # existing comment can't be moved to another parent or post.
+        if obj is not None:
+            return ('post', 'parent')
+        return ()
 
 
 @admin.register(Tag)
@@ -0,0 +1,256 @@
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from calendar import timegm
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+
+PAGE_CACHE_TIMEOUT = 60 * 5
+PAGE_CACHE_GRACE = 30
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+# Rendered in place of the CSRF token on cached pages and replaced with the
+# reader's own token on every response, so cached forms stay valid.
+CSRF_PLACEHOLDER = 'csrf-token-placeholder-f9b1c3'
+
+
+class AtomicFileBasedCache(FileBasedCache):
+    # FileBasedCache.add() is has_key() followed by set(), so two processes
+    # can both add the same key. The rebuild locks of the page cache rely on
+    # add() succeeding once, so it runs under an flock() shared by all
+    # processes using the directory. The kernel drops the lock when a
+    # process dies, no stale lock files are left.
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        with open(os.path.join(self._dir, 'add.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return super().add(key, value, timeout, version)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class StaleWhileRevalidateCache:
+    # Only one worker rebuilds an expired or invalidated key, guarded by a
+    # cache.add() lock. Meanwhile the others serve the stale copy for up to
+    # `grace` seconds or, when there is no copy at all, wait for the rebuild.
+
+    def __init__(self, alias='default', grace=PAGE_CACHE_GRACE, lock_timeout=10, poll_interval=0.05):
+        self.alias = alias
+        self.grace = grace
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'coalesced': 0}
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _lock(self, key):
+        return self.cache.add(key + ':lock', 1, self.lock_timeout)
+
+    def _is_fresh(self, entry, version, now):
+        return entry['built'] >= version and now < entry['expires']
+
+    def _stale_since(self, entry, version):
+        return version if entry['built'] < version else entry['expires']
+
+    def _build(self, key, build, timeout, locked):
+        # The build start time is stored, so an invalidation that happens
+        # while building still marks the result as stale.
+        self._count('misses')
+        built = time.time()
+        try:
+            value = build()
+            if value is not None:
+                entry = {'value': value, 'built': built, 'expires': built + timeout}
+                self.cache.set(key, entry, timeout + self.grace)
+            return value
+        finally:
+            if locked:
+                self.cache.delete(key + ':lock')
+
+    def get_or_build(self, key, build, timeout, version=0):
+        # `build` returns the value to cache, or None when the result must
+        # not be cached. `version` is the time of the last invalidation.
+        now = time.time()
+        entry = self.cache.get(key)
+        if entry is not None:
+            if self._is_fresh(entry, version, now):
+                self._count('hits')
+                return entry['value']
+            locked = self._lock(key)
+            if not locked and now - self._stale_since(entry, version) <= self.grace:
+                self._count('stale')
+                return entry['value']
+            return self._build(key, build, timeout, locked)
+
+        if self._lock(key):
+            return self._build(key, build, timeout, True)
+
+        deadline = now + self.lock_timeout
+        while time.time() < deadline:
+            time.sleep(self.poll_interval)
+            entry = self.cache.get(key)
+            if entry is not None and self._is_fresh(entry, version, time.time()):
+                self._count('coalesced')
+                return entry['value']
+            if self._lock(key):
+                return self._build(key, build, timeout, True)
+        # The other worker is too slow, build without waiting any longer.
+        return self._build(key, build, timeout, False)
+
+
+page_cache = StaleWhileRevalidateCache(grace=getattr(settings, 'BLOG_PAGE_CACHE_GRACE', PAGE_CACHE_GRACE))
+
+
+def _hash(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def page_version_key(path):
+    return 'blog:page-version:{}'.format(_hash(path))
+
+
+def page_version(path):
+    # Versions are invalidation timestamps. A missing version (never set or
+    # evicted) starts a new one, so an older cached page is never fresh.
+    key = page_version_key(path)
+    version = page_cache.cache.get(key)
+    if version is None:
+        page_cache.cache.add(key, time.time(), None)
+        version = page_cache.cache.get(key)
+    return version
+
+
+def page_cache_key(request):
+    return 'blog:page:{}:{}'.format(_hash(request.path), _hash(request.META.get('QUERY_STRING', '')))
+
+
+def invalidate_paths(paths):
+    # Every cached variant of a path (any query string) goes stale at once.
+    now = time.time()
+    page_cache.cache.set_many({page_version_key(path): now for path in paths}, None)
+
+
+def insert_csrf_token(request, response):
+    placeholder = CSRF_PLACEHOLDER.encode()
+    if not response.streaming and placeholder in response.content:
+        response.content = response.content.replace(placeholder, get_token(request).encode())
+    return response
+
+
+class AnonymousPageCacheMixin:
+    page_cache_timeout = None
+
+    def get_page_cache_timeout(self):
+        if self.page_cache_timeout is not None:
+            return self.page_cache_timeout
+        return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', PAGE_CACHE_TIMEOUT)
+
+    def get_page_version(self, request):
+        return page_version(request.path)
+
+    def page_cacheable(self, request):
+        return (request.method in ('GET', 'HEAD')
+                and self.get_page_cache_timeout() > 0
+                and not request.user.is_authenticated)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.page_cache_miss = False
+        if not self.page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        built = []
+
+        def build():
+            self.page_cache_miss = True
+            response = super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            built.append(response)
+            if response.status_code == 200 and not response.streaming:
+                headers = {name: response[name] for name in VALIDATOR_HEADERS if response.has_header(name)}
+                return {'content': response.content, 'content_type': response['Content-Type'],
+                        'headers': headers}
+            return None
+
+        cached = page_cache.get_or_build(page_cache_key(request), build,
+                                         self.get_page_cache_timeout(), self.get_page_version(request))
+        if built:
+            response = built[0]
+        else:
+            response = HttpResponse(cached['content'], content_type=cached['content_type'])
+            for name, value in cached['headers'].items():
+                response[name] = value
+            # Validators of the cached copy are stored with it, so hits
+            # answer conditional requests without touching the database.
+            response = get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+                response=response,
+            )
+        return insert_csrf_token(request, response)
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        if self.page_cache_miss:
+            context['csrf_token'] = CSRF_PLACEHOLDER
+        return context
+
+
+class ConditionalGetMixin:
+    # Answers If-None-Match / If-Modified-Since with a 304 before the view
+    # does any work. get_validators() must be cheaper than rendering the
+    # page and return (etag, last_modified), either of which may be None.
+
+    def get_validators(self):
+        return None, None
+
+    def get_etag(self, *parts):
+        # Pages differ for each logged in user, so the user is part of it.
+        parts += (self.request.user.pk or 'anonymous',)
+        return _hash(':'.join(str(part) for part in parts))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators()
+        etag = etag and quote_etag(etag)
+        timestamp = last_modified and timegm(last_modified.utctimetuple())
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            if etag:
+                response.setdefault('ETag', etag)
+            if timestamp and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(timestamp)
+        return response
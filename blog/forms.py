@@ -8,9 +8,10 @@ class CommentForm(forms.ModelForm):
 
     class Meta:
         model = Comment
-        fields = ['name', 'email', 'body']
+        fields = ['name', 'email', 'body', 'parent']
 
         widgets = {
+            'parent': forms.HiddenInput(),
             'name': forms.TextInput(attrs={'class': 'form-control',
                                            'placeholder': 'Name'}),
             'email': forms.EmailInput(attrs={'class': 'form-control',
@@ -21,9 +22,18 @@ class CommentForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
+        post = kwargs.pop('post', None)
         super(CommentForm, self).__init__(*args, **kwargs)
+        if post is not None:
+            self.fields['parent'].queryset = post.comments.filter(active=True)
         if user.is_authenticated:
-            self.fields = {'body': self.fields['body']}
+            self.fields = {'body': self.fields['body'], 'parent': self.fields['parent']}
+
+    def clean_parent(self):
+        parent = self.cleaned_data['parent']
+        if parent and not parent.can_reply():
+            raise ValidationError('This thread is too deep to reply to')
+        return parent
 
 
 class PostForm(forms.ModelForm):
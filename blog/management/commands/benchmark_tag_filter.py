@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post, Tag
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(int(len(timings) * fraction), len(timings) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Time multi-tag filtering for 1, 3 and 5 tags on a seeded dataset. '
+            'The data is created inside a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--tags-per-post', type=int, default=4)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def seed(self, rng, options):
+        author = get_user_model().objects.create_user(username='benchmark-tag-filter')
+        Tag.objects.bulk_create(
+            Tag(title='bench {}'.format(i), slug='bench-{}'.format(i)) for i in range(options['tags'])
+        )
+        tags = list(Tag.objects.filter(slug__startswith='bench-').order_by('pk'))
+        Post.objects.bulk_create(
+            (Post(title='Bench {}'.format(i), slug='bench-{}'.format(i), body='Body',
+                  author=author, published=i % 10 != 0)
+             for i in range(options['posts'])),
+            batch_size=500,
+        )
+        posts = Post.objects.filter(slug__startswith='bench-').values_list('pk', flat=True)
+
+        # Zipf-like popularity, a few tags are on most posts.
+        weights = [1 / (rank + 1) for rank in range(len(tags))]
+        Through = Post.tags.through
+        links = []
+        for post_id in posts:
+            for tag in set(rng.choices(tags, weights, k=options['tags_per_post'])):
+                links.append(Through(post_id=post_id, tag_id=tag.pk))
+        Through.objects.bulk_create(links, batch_size=500)
+        return tags
+
+    def measure(self, tag_ids, match_all):
+        started = time.perf_counter()
+        posts = Post.tagged(tag_ids, match_all).order_by('-created')
+        count = posts.count()
+        list(posts[:10])
+        return time.perf_counter() - started, count
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            tags = self.seed(rng, options)
+            popular = [tag.pk for tag in tags[:20]]
+
+            self.stdout.write('{:>5} {:>4} {:>9} {:>9} {:>9}'.format('tags', 'mode', 'p50 ms', 'p95 ms', 'rows'))
+            for size in (1, 3, 5):
+                for match_all in (True, False):
+                    timings, counts = [], []
+                    for _ in range(options['repeat']):
+                        elapsed, count = self.measure(rng.sample(popular, size), match_all)
+                        timings.append(elapsed * 1000)
+                        counts.append(count)
+                    self.stdout.write('{:>5} {:>4} {:>9.2f} {:>9.2f} {:>9}'.format(
+                        size, 'all' if match_all else 'any',
+                        percentile(timings, 0.5), percentile(timings, 0.95), sorted(counts)[len(counts) // 2]))
+
+            transaction.set_rollback(True)
@@ -0,0 +1,98 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+
+from blog.models import POSTS_COUNT_CACHE_KEY, Post, Tag
+
+
+# SQLite reports reading a whole table or index as "SCAN <table>", while
+# indexed lookups are reported as "SEARCH <table> USING ...".
+SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?( USING (?:COVERING )?INDEX \w+)?$')
+
+
+def full_scans(sql, tables):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        details = [row[-1] for row in cursor.fetchall()]
+
+    scans = []
+    for detail in details:
+        match = SCAN.match(detail)
+        # Scans of derived tables (subqueries) are fine, their own plan rows
+        # are listed and checked separately.
+        if not match or match.group(1) not in tables:
+            continue
+        # Walking an index in order is how unfiltered listings are served,
+        # but a filtered query that walks a whole index missed its index.
+        if match.group(2) and ' WHERE ' not in sql:
+            continue
+        scans.append(detail)
+    return scans
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN QUERY PLAN on the queries of each blog view and fail on full table scans'
+
+    def get_urls(self):
+        urls = [reverse('home'), reverse('home') + '?page=2',
+                reverse('home') + '?search=django', reverse('home') + '?order=popular',
+                reverse('tag_list')]
+
+        post = Post.objects.filter(published=True).select_related('author').first()
+        if post:
+            urls.append(post.get_absolute_url())
+            urls.append(reverse('post_comments', args=[post.slug]))
+            urls.append(reverse('posts_by_author', args=[post.author.username]))
+        else:
+            self.stderr.write('No published posts, skipping post_detail and posts_by_author')
+
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        if slugs:
+            urls.append(reverse('tag_detail', args=[slugs[0]]))
+            urls.append(reverse('tag_detail', args=['+'.join(sorted(slugs))]))
+            urls.append(reverse('home') + '?tags=' + ','.join(slugs))
+        else:
+            self.stderr.write('No tags, skipping tag_detail')
+        return urls
+
+    def get(self, url):
+        request = RequestFactory().get(url)
+        request.user = AnonymousUser()
+        match = resolve(request.path_info)
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Query plans can only be checked on SQLite')
+
+        tables = set(connection.introspection.table_names())
+        failures = []
+        for url in self.get_urls():
+            # Cache hits run no queries and would pass unchecked.
+            cache.delete(POSTS_COUNT_CACHE_KEY)
+            with override_settings(BLOG_PAGE_CACHE_TIMEOUT=0), CaptureQueriesContext(connection) as queries:
+                self.get(url)
+
+            for query in queries.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                scans = full_scans(query['sql'], tables)
+                if scans:
+                    failures.append((url, query['sql'], scans))
+                elif options['verbosity'] > 1:
+                    self.stdout.write('ok   {}  {}'.format(url, query['sql']))
+
+        for url, sql, scans in failures:
+            self.stderr.write('FULL SCAN ({}) {}\n    {}'.format(', '.join(scans), url, sql))
+        if failures:
+            raise CommandError('{} queries fall back to a full table scan'.format(len(failures)))
+        self.stdout.write(self.style.SUCCESS('All view queries use indexes'))
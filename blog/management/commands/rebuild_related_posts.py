@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post, RelatedPost, StaleRelatedPost
+from blog.related import rebuild_related, refresh_stale
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the related posts of every post from shared tags and recency. With --stale '
+            'only the posts queued by tag, publish and delete changes, meant to run periodically.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--stale', action='store_true',
+                            help='Only rebuild the posts whose related list is out of date')
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            refreshed = refresh_stale(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS('Refreshed related posts of {} posts'.format(refreshed)))
+            return
+        StaleRelatedPost.objects.all().delete()
+        built = rebuild_related(Post, RelatedPost, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt related posts of {} posts'.format(built)))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from blog import search
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        search.create_fts_table()
+        use_fts = search.fts_available()
+        if use_fts:
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {}'.format(search.FTS_TABLE))
+
+        # One transaction per batch, not one commit per post.
+        count = 0
+        last_pk = 0
+        while True:
+            posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                         .only('title', 'body')[:options['batch_size']])
+            if not posts:
+                break
+            with transaction.atomic():
+                for post in posts:
+                    search.index_post(post, use_fts=use_fts)
+            count += len(posts)
+            last_pk = posts[-1].pk
+
+        backend = 'FTS5' if use_fts else 'term index'
+        self.stdout.write(self.style.SUCCESS('Indexed {} posts ({})'.format(count, backend)))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from blog.models import Comment, Post
+
+
+def active_comment_count():
+    active = (Comment.objects.filter(post=OuterRef('pk'), active=True)
+              .order_by().values('post').annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(active, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Repair Post.comment_count drift from the active comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+
+        fixed = 0
+        for start in range(0, last_pk + 1, batch_size):
+            batch = Post.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+            drifted = (batch.annotate(actual=active_comment_count())
+                       .exclude(comment_count=F('actual')).values('pk'))
+            with transaction.atomic():
+                # updated is part of the card cache key and the ETags.
+                fixed += Post.objects.filter(pk__in=drifted).update(comment_count=active_comment_count(),
+                                                                    updated=timezone.now())
+
+        self.stdout.write(self.style.SUCCESS('Fixed comment counts of {} posts'.format(fixed)))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Tag
+
+
+class Command(BaseCommand):
+    help = 'Repair Tag.post_count drift from the published posts'
+
+    def handle(self, *args, **options):
+        counted = Tag.recount(list(Tag.objects.values_list('pk', flat=True)))
+        self.stdout.write(self.style.SUCCESS('Recounted posts of {} tags'.format(counted)))
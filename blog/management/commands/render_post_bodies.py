@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+from blog.utils import render_post_bodies
+
+
+class Command(BaseCommand):
+    help = 'Backfill the pre-rendered body_html and excerpt of every post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rendered = render_post_bodies(Post, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rendered {} posts'.format(rendered)))
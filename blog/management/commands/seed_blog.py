@@ -0,0 +1,235 @@
+import datetime
+import itertools
+import random
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from pytils.translit import slugify
+
+from blog.models import COMMENT_PATH_STEP, Comment, Post, RelatedPost, Tag
+from blog.popularity import update_popularity
+from blog.related import rebuild_related
+from blog.utils import make_excerpt, render_body
+
+
+WORDS = [
+    'быстрый', 'запрос', 'индекс', 'кэш', 'шаблон', 'сервер', 'очередь', 'поток',
+    'память', 'профиль', 'задержка', 'таблица', 'миграция', 'страница', 'ответ',
+    'модель', 'поиск', 'тег', 'пост', 'комментарий', 'нагрузка', 'метрика',
+    'django', 'python', 'sqlite', 'orm', 'http', 'api', 'json', 'linux',
+]
+NAMES = ['Аня', 'Борис', 'Вера', 'Глеб', 'Дина', 'Егор', 'Жанна', 'Илья', 'Катя', 'Лев']
+SEED_PASSWORD = 'seed-password'
+# Replies go to one of the latest comments of a post.
+REPLY_WINDOW = 20
+# Comments arrive within this many days of the post, replies of their parent.
+COMMENT_DELAY_DAYS = 30
+REPLY_DELAY_DAYS = 3
+# Rebuilding the search index and related posts takes about a minute per
+# 2000 posts, larger seeds skip it unless --index is given.
+AUTO_INDEX_POSTS = 1000
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    # bulk_create would overwrite auto_now / auto_now_add with the current time.
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def zipf_weights(count, skew):
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+class Command(BaseCommand):
+    help = ('Create users, tags, posts and comments with long-tail distributions. '
+            'Runs are deterministic for the same --seed and --end on an empty database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread post dates over this many days before --end')
+        parser.add_argument('--end', default='2026-01-01', help='Date of the newest post, YYYY-MM-DD')
+        parser.add_argument('--tag-skew', type=float, default=1.0,
+                            help='Zipf exponent of tag popularity')
+        parser.add_argument('--comment-skew', type=float, default=1.2,
+                            help='Pareto shape of comments per post, lower is a longer tail')
+        parser.add_argument('--reply-ratio', type=float, default=0.3)
+        parser.add_argument('--index', dest='index', action='store_true', default=None,
+                            help='Rebuild the search index and related posts, the default '
+                                 'for up to {} posts'.format(AUTO_INDEX_POSTS))
+        parser.add_argument('--no-index', dest='index', action='store_false',
+                            help='Skip the rebuilds, run rebuild_search_index and '
+                                 'rebuild_related_posts later')
+
+    def batches(self, objects, batch_size):
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def bulk_create(self, model, objects, batch_size):
+        created = 0
+        for batch in self.batches(objects, batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            created += len(batch)
+        return created
+
+    def sentence(self, rng, low, high):
+        return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+    def create_users(self, rng, count, joined_before, batch_size):
+        User = get_user_model()
+        start = next_pk(User)
+        password = make_password(SEED_PASSWORD)
+        users = (User(pk=pk, username='user{}'.format(pk), email='user{}@example.com'.format(pk),
+                      password=password, is_staff=rng.random() < 0.02,
+                      date_joined=joined_before - datetime.timedelta(days=rng.random() * 365))
+                 for pk in range(start, start + count))
+        self.bulk_create(User, users, batch_size)
+        return list(User.objects.filter(pk__gte=start).values_list('pk', 'username', 'is_staff'))
+
+    def create_tags(self, rng, count, batch_size):
+        start = next_pk(Tag)
+
+        def tags():
+            for pk in range(start, start + count):
+                title = '{} {}'.format(rng.choice(WORDS), pk)
+                yield Tag(pk=pk, title=title, slug=slugify(title))
+
+        self.bulk_create(Tag, tags(), batch_size)
+        return list(range(start, start + count))
+
+    def create_posts(self, rng, users, tag_ids, end, options):
+        start = next_pk(Post)
+        count = options['posts']
+        span = datetime.timedelta(days=options['days']).total_seconds()
+        tag_weights = list(itertools.accumulate(zipf_weights(len(tag_ids), options['tag_skew'])))
+        links = []
+        dates = {}
+
+        def posts():
+            for pk in range(start, start + count):
+                author_id, username, is_staff = rng.choice(users)
+                title = '{} {}'.format(self.sentence(rng, 2, 6), pk).capitalize()
+                body = '\n\n'.join(self.sentence(rng, 20, 80) for _ in range(rng.randint(1, 5)))
+                created = end - datetime.timedelta(seconds=span * (start + count - 1 - pk) / max(count, 1))
+                dates[pk] = created
+                for tag_id in set(rng.choices(tag_ids, cum_weights=tag_weights, k=rng.randint(1, 5))):
+                    links.append(Post.tags.through(post_id=pk, tag_id=tag_id))
+                yield Post(pk=pk, title=title, slug=slugify(title), author_id=author_id,
+                           body=body, body_html=render_body(body), excerpt=make_excerpt(body),
+                           created=created, updated=created, published=rng.random() < 0.9,
+                           author_status='staff' if is_staff else 'user',
+                           views=int(rng.paretovariate(1.5) * 10))
+
+        fields = Post._meta.get_field('created'), Post._meta.get_field('updated')
+        with explicit_timestamps(*fields):
+            self.bulk_create(Post, posts(), options['batch_size'])
+        self.bulk_create(Post.tags.through, links, options['batch_size'])
+        return dates
+
+    def create_comments(self, rng, users, post_dates, end, options):
+        start = next_pk(Comment)
+        count = options['comments']
+        post_ids = list(post_dates)
+        # Long tail: most posts get a few comments, a few posts get thousands.
+        weights = list(itertools.accumulate(rng.paretovariate(options['comment_skew']) for _ in post_ids))
+        recent = {}
+
+        def comments():
+            for pk in range(start, start + count):
+                post_id = rng.choices(post_ids, cum_weights=weights)[0]
+                thread = recent.setdefault(post_id, [])
+                parent_id, path, after, delay = None, '', post_dates[post_id], COMMENT_DELAY_DAYS
+                if thread and rng.random() < options['reply_ratio']:
+                    parent_id, path, after = rng.choice(thread)
+                    delay = REPLY_DELAY_DAYS
+                    if len(path) + COMMENT_PATH_STEP > Comment._meta.get_field('path').max_length:
+                        parent_id, path, after, delay = None, '', post_dates[post_id], COMMENT_DELAY_DAYS
+                path += str(pk).zfill(COMMENT_PATH_STEP)
+                created = min(after + datetime.timedelta(days=rng.random() * delay), end)
+                thread.append((pk, path, created))
+                del thread[:-REPLY_WINDOW]
+
+                if rng.random() < 0.5:
+                    _, name, is_staff = rng.choice(users)
+                    status = 'staff' if is_staff else 'user'
+                else:
+                    name, status = rng.choice(NAMES), 'anonymous'
+                yield Comment(pk=pk, post_id=post_id, parent_id=parent_id, path=path,
+                              name=name, email='{}@example.com'.format(slugify(name)),
+                              body=self.sentence(rng, 3, 40), author_status=status,
+                              active=rng.random() < 0.95, created=created)
+
+        with explicit_timestamps(Comment._meta.get_field('created')):
+            return self.bulk_create(Comment, comments(), options['batch_size'])
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['tags'] < 1:
+            raise CommandError('At least one user and one tag are needed')
+        try:
+            end = timezone.make_aware(datetime.datetime.strptime(options['end'], '%Y-%m-%d'))
+        except ValueError:
+            raise CommandError('--end must be a date like 2026-01-01')
+
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        first_post = end - datetime.timedelta(days=options['days'])
+        users = self.create_users(rng, options['users'], first_post, batch_size)
+        self.stdout.write('Created {} users'.format(len(users)))
+        tag_ids = self.create_tags(rng, options['tags'], batch_size)
+        self.stdout.write('Created {} tags'.format(len(tag_ids)))
+        post_dates = self.create_posts(rng, users, tag_ids, end, options)
+        self.stdout.write('Created {} posts'.format(len(post_dates)))
+        comments = self.create_comments(rng, users, post_dates, end, options) if post_dates else 0
+        self.stdout.write('Created {} comments'.format(comments))
+
+        # bulk_create skips save() and signals, so fill the denormalized data.
+        # Scores are computed as of --end rather than the wall clock.
+        call_command('recount_comments', batch_size=batch_size, stdout=self.stdout)
+        if post_dates:
+            # The recount marks the posts as updated now.
+            Post.objects.filter(pk__gte=min(post_dates)).update(updated=F('created'))
+        call_command('recount_tags', stdout=self.stdout)
+        updated = update_popularity(Post, now=end, batch_size=batch_size)
+        self.stdout.write('Updated popularity of {} posts'.format(updated))
+        index = options['index']
+        if index is None:
+            index = len(post_dates) <= AUTO_INDEX_POSTS
+        if index:
+            call_command('rebuild_search_index', batch_size=batch_size, stdout=self.stdout)
+            built = rebuild_related(Post, RelatedPost, batch_size, now=end)
+            self.stdout.write('Rebuilt related posts of {} posts'.format(built))
+        else:
+            self.stdout.write('Skipped the search index and related posts, run rebuild_search_index '
+                              'and rebuild_related_posts to fill them')
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Seeded the blog with seed {}'.format(options['seed'])))
@@ -0,0 +1,38 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.slow_queries import aggregate, read_log
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slow query log: statements grouped by fingerprint, by total time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=getattr(settings, 'BLOG_SLOW_QUERY_LOG', None),
+                            help='Slow query log file, BLOG_SLOW_QUERY_LOG by default')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if not options['log']:
+            raise CommandError('No slow query log, set BLOG_SLOW_QUERY_LOG or pass --log')
+        try:
+            rows = aggregate(read_log(options['log']))[:options['limit']]
+        except FileNotFoundError:
+            raise CommandError('{} does not exist, no slow queries were logged'.format(options['log']))
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+
+        for rank, row in enumerate(rows, 1):
+            self.stdout.write('{}. {} x{}  total {:.1f} ms  mean {:.1f} ms  max {:.1f} ms  views: {}'.format(
+                rank, row['fingerprint'], row['count'], row['total_ms'], row['mean_ms'], row['max_ms'],
+                ', '.join(row['views']) or '-'))
+            self.stdout.write('   ' + row['normalized'])
+            for detail in row['plan'] or ():
+                self.stdout.write('     ' + detail)
+        if not rows:
+            self.stdout.write('No slow queries logged')
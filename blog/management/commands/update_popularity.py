@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+from blog.popularity import update_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed popularity score of every post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        updated = update_popularity(Post, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Updated popularity of {} posts'.format(updated)))
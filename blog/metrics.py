@@ -0,0 +1,314 @@
+import bisect
+import fcntl
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import page_cache
+
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+WRITE_INTERVAL = 1.0
+SNAPSHOT_NAME = re.compile(r'^metrics-(\d+)-(\d+)\.json$')
+RETIRED_SNAPSHOT = 'metrics-retired.json'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(key), self._copy(value)] for key, value in self._values.items()]
+        return {'kind': self.kind, 'help': self.documentation, 'labels': list(self.labelnames),
+                'values': values}
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    # Each value is a list of per-bucket counts, the last bucket being
+    # +Inf, followed by the sum of all observations.
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, amount, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, amount)
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                value = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            value[index] += 1
+            value[-1] += amount
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+    def _copy(self, value):
+        return list(value)
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+
+registry = Registry()
+requests_total = registry.register(Counter(
+    'blog_requests_total', 'Requests by URL name, method and response status.',
+    ('view', 'method', 'status')))
+request_duration = registry.register(Histogram(
+    'blog_request_duration_seconds', 'Request latency by URL name.', ('view',)))
+request_queries = registry.register(Histogram(
+    'blog_request_queries', 'Database queries per request by URL name.', ('view',), QUERY_BUCKETS))
+db_duration = registry.register(Counter(
+    'blog_db_duration_seconds_total', 'Time spent in database queries by URL name.', ('view',)))
+comments_submitted = registry.register(Counter(
+    'blog_comments_submitted_total', 'Comment form submissions by result.', ('result',)))
+
+
+def collect():
+    data = registry.snapshot()
+    data['blog_page_cache_requests_total'] = {
+        'kind': 'counter', 'help': 'Page cache lookups by result.', 'labels': ['result'],
+        'values': [[[result], count] for result, count in sorted(page_cache.stats().items())],
+    }
+    return data
+
+
+def merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            target = merged.setdefault(name, dict(data, values={}))
+            for key, value in data['values']:
+                key = tuple(key)
+                current = target['values'].get(key)
+                if current is None:
+                    target['values'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['values'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['values'][key] = current + value
+    return merged
+
+
+def metrics_dir():
+    return getattr(settings, 'BLOG_METRICS_DIR', None)
+
+
+def process_start(pid):
+    # Start time of a process in clock ticks since boot, None without /proc
+    # or when there is no such process.
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces, the fields after it do not.
+    return int(stat.rsplit(')', 1)[1].split()[19])
+
+
+def process_alive(pid, started):
+    if os.path.isdir('/proc/self'):
+        return process_start(pid) == started
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write_json(directory, path, data):
+    fd, temp = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp, path)
+
+
+class SnapshotWriter:
+    # With several worker processes each one writes its own snapshot to
+    # BLOG_METRICS_DIR, at most once per interval, and the /metrics view
+    # adds all of them up. Snapshots are named by pid and process start
+    # time, so a new worker reusing a pid does not overwrite the totals of
+    # the old one, and retire_snapshots() folds dead workers into one file.
+
+    def __init__(self, interval=WRITE_INTERVAL):
+        self.interval = interval
+        self._written = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._started = None
+
+    def path(self, directory):
+        pid = os.getpid()
+        if pid != self._pid:
+            # Also true in a worker forked after this module was imported.
+            self._pid, self._started = pid, process_start(pid) or int(time.time() * 1000)
+        return os.path.join(directory, 'metrics-{}-{}.json'.format(self._pid, self._started))
+
+    def write(self, force=False):
+        directory = metrics_dir()
+        if not directory:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._written < self.interval:
+                return False
+            self._written = now
+        os.makedirs(directory, exist_ok=True)
+        _write_json(directory, self.path(directory), collect())
+        return True
+
+
+snapshot_writer = SnapshotWriter(getattr(settings, 'BLOG_METRICS_WRITE_INTERVAL', WRITE_INTERVAL))
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_snapshots(directory):
+    snapshots = (_read_snapshot(path) for path in sorted(glob.glob(os.path.join(directory, 'metrics-*.json'))))
+    return [snapshot for snapshot in snapshots if snapshot is not None]
+
+
+def retire_snapshots(directory):
+    # Adds the snapshots of dead workers to metrics-retired.json and removes
+    # them, so the directory does not grow with every recycled worker.
+    with open(os.path.join(directory, 'retire.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            dead = []
+            for name in os.listdir(directory):
+                match = SNAPSHOT_NAME.match(name)
+                if match and not process_alive(int(match.group(1)), int(match.group(2))):
+                    dead.append(os.path.join(directory, name))
+            if not dead:
+                return 0
+            retired = os.path.join(directory, RETIRED_SNAPSHOT)
+            snapshots = [_read_snapshot(path) for path in [retired] + dead]
+            merged = merge(snapshot for snapshot in snapshots if snapshot is not None)
+            _write_json(directory, retired, {
+                name: dict(data, values=[[list(key), value] for key, value in data['values'].items()])
+                for name, data in merged.items()
+            })
+            for path in dead:
+                os.remove(path)
+            return len(dead)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def gather():
+    directory = metrics_dir()
+    if not directory:
+        return merge([collect()])
+    snapshot_writer.write(force=True)
+    retire_snapshots(directory)
+    return merge(read_snapshots(directory))
+
+
+def _histogram_lines(name, labels, buckets, value):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(buckets) + [float('inf')], value[:-1]):
+        cumulative += count
+        lines.append('{}_bucket{} {}'.format(name, _format_labels(labels + [('le', _format_value(bound))]),
+                                             cumulative))
+    lines.append('{}_sum{} {}'.format(name, _format_labels(labels), _format_value(value[-1])))
+    lines.append('{}_count{} {}'.format(name, _format_labels(labels), cumulative))
+    return lines
+
+
+def render(metrics):
+    lines = []
+    for name, data in sorted(metrics.items()):
+        lines.append('# HELP {} {}'.format(name, data['help']))
+        lines.append('# TYPE {} {}'.format(name, data['kind']))
+        for key, value in sorted(data['values'].items()):
+            labels = list(zip(data['labels'], key))
+            if data['kind'] == 'histogram':
+                lines.extend(_histogram_lines(name, labels, data['buckets'], value))
+            else:
+                lines.append('{}{} {}'.format(name, _format_labels(labels), _format_value(value)))
+
+    lookups = dict((key[0], value) for key, value in
+                   metrics.get('blog_page_cache_requests_total', {}).get('values', {}).items())
+    total = sum(lookups.values())
+    if total:
+        served = lookups.get('hits', 0) + lookups.get('stale', 0) + lookups.get('coalesced', 0)
+        lines.append('# HELP blog_page_cache_hit_ratio Share of page cache lookups served from the cache.')
+        lines.append('# TYPE blog_page_cache_hit_ratio gauge')
+        lines.append('blog_page_cache_hit_ratio {}'.format(_format_value(served / total)))
+    return '\n'.join(lines) + '\n'
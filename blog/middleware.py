@@ -0,0 +1,176 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from . import metrics, profiling, slow_queries, timing
+
+
+logger = logging.getLogger('blog.timing')
+
+TIMING_SAMPLE_RATE = 1.0
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_QUERIES = 50
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_SLOW_MS = 1000
+PROFILE_KEEP = 100
+
+
+def url_name(request):
+    match = request.resolver_match
+    return (match.url_name or match.view_name) if match else 'unmatched'
+
+
+class RequestTimingMiddleware:
+    # Counts queries, SQL time, template time and the rest (view code and
+    # middleware) for a sampled fraction of requests. The numbers go to a
+    # Server-Timing header and a JSON log line. Requests over the query or
+    # time limits are logged as warnings together with their SQL.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'BLOG_TIMING_SAMPLE_RATE', TIMING_SAMPLE_RATE)
+        self.slow_ms = getattr(settings, 'BLOG_SLOW_REQUEST_MS', SLOW_REQUEST_MS)
+        self.slow_queries = getattr(settings, 'BLOG_SLOW_REQUEST_QUERIES', SLOW_REQUEST_QUERIES)
+
+    def sampled(self, request):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.sampled(request):
+            return self.get_response(request)
+
+        timings = timing.RequestTimings()
+        timing.activate(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            timing.deactivate()
+        total = time.perf_counter() - started
+
+        metrics = self.metrics(timings, total)
+        header = ['db;dur={:.1f};desc="{} queries"'.format(metrics['db'], timings.queries)]
+        header += ['{};dur={:.1f}'.format(name, metrics[name]) for name in ('tpl', 'view', 'total')]
+        response['Server-Timing'] = ', '.join(header)
+        self.log(request, response, timings, metrics)
+        return response
+
+    def metrics(self, timings, total):
+        return {
+            'db': timings.db_time * 1000,
+            'tpl': timings.template_time * 1000,
+            'view': max(total - timings.db_time - timings.template_time, 0) * 1000,
+            'total': total * 1000,
+        }
+
+    def log(self, request, response, timings, metrics):
+        match = request.resolver_match
+        line = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timings.queries,
+        }
+        line.update(('{}_ms'.format(name), round(value, 1)) for name, value in metrics.items())
+        logger.info(json.dumps(line, sort_keys=True))
+
+        if timings.queries > self.slow_queries or metrics['total'] > self.slow_ms:
+            queries = '\n'.join('{:8.1f} ms  {}'.format(elapsed * 1000, sql) for elapsed, sql in timings.sql)
+            logger.warning('Slow request %s %s: %.1f ms, %d queries\n%s', request.method,
+                           request.get_full_path(), metrics['total'], timings.queries, queries)
+
+
+class MetricsMiddleware:
+    # Feeds the counters and histograms served by /metrics. Every request is
+    # counted, by URL name so that the labels stay few.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = timing.RequestTimings(keep_sql=False)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = url_name(request)
+        metrics.requests_total.inc(view=view, method=request.method, status=response.status_code)
+        metrics.request_duration.observe(elapsed, view=view)
+        metrics.request_queries.observe(timings.queries, view=view)
+        metrics.db_duration.inc(timings.db_time, view=view)
+        metrics.snapshot_writer.write()
+        return response
+
+
+class ProfilerMiddleware:
+    # Staff users get a profile of the request instead of the page with
+    # ?_profile=1 (cProfile by cumulative time) or ?_profile=collapsed
+    # (sampled stacks for flame graphs). Besides, a sampled fraction of all
+    # requests is profiled and kept in BLOG_PROFILE_DIR when it is slower
+    # than BLOG_PROFILE_SLOW_MS.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.directory = getattr(settings, 'BLOG_PROFILE_DIR', None)
+        self.sample_rate = getattr(settings, 'BLOG_PROFILE_SAMPLE_RATE', PROFILE_SAMPLE_RATE)
+        self.slow_ms = getattr(settings, 'BLOG_PROFILE_SLOW_MS', PROFILE_SLOW_MS)
+        self.keep = getattr(settings, 'BLOG_PROFILE_KEEP', PROFILE_KEEP)
+
+    def __call__(self, request):
+        mode = request.GET.get('_profile')
+        if mode and request.user.is_staff:
+            return self.profile_response(request, mode)
+        if self.directory and self.sample_rate and random.random() < self.sample_rate:
+            return self.profile_slow(request)
+        return self.get_response(request)
+
+    def profile_response(self, request, mode):
+        started = time.perf_counter()
+        if mode == 'collapsed':
+            with profiling.StackSampler() as sampler:
+                self.get_response(request)
+            return HttpResponse(sampler.collapsed(), content_type='text/plain; charset=utf-8')
+
+        profiler, response = profiling.profile(lambda: self.get_response(request))
+        header = '{} {} -> {} in {:.1f} ms\n\n'.format(
+            request.method, request.get_full_path(), response.status_code,
+            (time.perf_counter() - started) * 1000)
+        return HttpResponse(header + profiling.format_stats(profiler), content_type='text/plain; charset=utf-8')
+
+    def profile_slow(self, request):
+        started = time.perf_counter()
+        profiler, response = profiling.profile(lambda: self.get_response(request))
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed > self.slow_ms:
+            name = '{}-{:.0f}ms'.format(url_name(request), elapsed)
+            profiling.save_profile(profiler, self.directory, name, self.keep)
+        return response
+
+
+class SlowQueryViewMiddleware:
+    # Tells the slow query log which view the queries come from.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.set_view(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slow_queries.set_view(url_name(request))
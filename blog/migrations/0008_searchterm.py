@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from blog import search
+
+
+def build_search_index(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    SearchTerm = apps.get_model('blog', 'SearchTerm')
+    use_fts = search.create_fts_table(schema_editor.connection)
+
+    for post in Post.objects.only('title', 'body').iterator():
+        SearchTerm.objects.bulk_create(
+            SearchTerm(post_id=post.pk, term=term, weight=weight)
+            for term, weight in search.build_terms(post.title, post.body).items()
+        )
+        if use_fts:
+            schema_editor.execute(
+                "INSERT INTO {} (rowid, title, body) VALUES (%s, %s, %s)".format(search.FTS_TABLE),
+                [post.pk, ' '.join(search.tokenize(post.title)), ' '.join(search.tokenize(post.body))]
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_fts_table(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_auto_20200404_1512'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='blog.Post')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
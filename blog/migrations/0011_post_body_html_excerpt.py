@@ -0,0 +1,42 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:43
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+
+def render_bodies(apps, schema_editor):
+    # A frozen copy of blog.utils.render_post_bodies, the historical Post
+    # has no updated field yet.
+    Post = apps.get_model('blog', 'Post')
+    last_pk = 0
+    while True:
+        posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'body')[:500])
+        if not posts:
+            return
+        for post in posts:
+            post.body_html = linebreaks(post.body, autoescape=True)
+            post.excerpt = Truncator(post.body).words(15, truncate=' …')
+        Post.objects.bulk_update(posts, ['body_html', 'excerpt'])
+        last_pk = posts[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='body_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_bodies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_paths(apps, schema_editor):
+    # Existing comments are all top level, their path is their own id.
+    Comment = apps.get_model('blog', 'Comment')
+    comments = [Comment(pk=pk, path=str(pk).zfill(10))
+                for pk in Comment.objects.values_list('pk', flat=True)]
+    Comment.objects.bulk_update(comments, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_post_updated'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ('path',)},
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_active_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='blog.Comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=250),
+        ),
+        migrations.RunPython(set_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'active', 'path'], name='comment_post_thread_idx'),
+        ),
+    ]
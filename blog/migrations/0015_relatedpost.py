@@ -0,0 +1,41 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from blog.related import rebuild_related
+
+
+def build_related_posts(apps, schema_editor):
+    rebuild_related(apps.get_model('blog', 'Post'), apps.get_model('blog', 'RelatedPost'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_post_views_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='blog.Post')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.Post')),
+            ],
+            options={
+                'ordering': ('-score',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='relatedpost',
+            index=models.Index(fields=['post', '-score'], name='relatedpost_post_score_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='relatedpost',
+            unique_together={('post', 'related')},
+        ),
+        migrations.RunPython(build_related_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 01:01
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_posts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Tag = apps.get_model('blog', 'Tag')
+    published = (Post.tags.through.objects
+                 .filter(tag_id=OuterRef('pk'), post__published=True)
+                 .order_by().values('tag_id').annotate(count=Count('pk')).values('count'))
+    Tag.objects.update(post_count=Coalesce(Subquery(published, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_relatedpost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-post_count', 'title'], name='tag_post_count_idx'),
+        ),
+        migrations.RunPython(count_posts, migrations.RunPython.noop),
+    ]
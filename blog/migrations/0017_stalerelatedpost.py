@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_tag_post_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleRelatedPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='blog.Post')),
+                ('neighbours', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -1,7 +1,19 @@
-from django.db import models
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from pytils.translit import slugify
 
+from .utils import make_excerpt, render_body
+
+
+POSTS_COUNT_CACHE_KEY = 'blog:posts_count'
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 10
+# Width of one zero-padded comment id in Comment.path.
+COMMENT_PATH_STEP = 10
+
 
 class Post(models.Model):
     title = models.CharField(max_length=200)
@@ -12,19 +24,49 @@ class Post(models.Model):
     )
 
     body = models.TextField()
+    body_html = models.TextField(blank=True, editable=False)
+    excerpt = models.TextField(blank=True, editable=False)
     slug = models.SlugField(max_length=250, unique=True)
     created = models.DateTimeField(auto_now_add=True)
+    # Card cache version: also bumped on tag and comment count changes.
+    updated = models.DateTimeField(auto_now=True)
     published = models.BooleanField(default=True)
     author_status = models.CharField(max_length=30, default='user')
     photo = models.ImageField(upload_to='photos/', blank=True)
     tags = models.ManyToManyField('Tag', blank=True, related_name='posts')
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    views = models.PositiveIntegerField(default=0, editable=False)
+    # Time-decayed ranking, recomputed by the update_popularity command.
+    popularity = models.FloatField(default=0, editable=False)
+
+    # Maintained with F() updates, never written back from an instance.
+    counter_fields = ('comment_count', 'views', 'popularity')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Post, cls).from_db(db, field_names, values)
+        # Lets signal handlers see what changed since the post was loaded.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title)
+        self.body_html = render_body(self.body)
+        self.excerpt = make_excerpt(self.body)
         if self.author.is_staff:
             self.author_status = 'staff'
 
+        if not self._state.adding and not kwargs.get('update_fields'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
         super(Post, self).save(*args, **kwargs)
+        # post_save handlers have compared against the old values by now.
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
 
     def __str__(self):
         return self.title
@@ -32,8 +74,31 @@ class Post(models.Model):
     def get_absolute_url(self):
         return reverse('post_detail', args=[str(self.slug)])
 
+    @classmethod
+    def tagged(cls, tag_ids, match_all=True):
+        # Published posts with all (or any) of the tags. For "all" the links
+        # are grouped per post in one subquery instead of a join per tag.
+        links = cls.tags.through.objects.filter(tag_id__in=tag_ids).values('post_id')
+        if match_all:
+            links = (links.annotate(matched=Count('tag_id'))
+                     .filter(matched=len(set(tag_ids))).values('post_id'))
+        return cls.objects.filter(published=True, pk__in=links)
+
+    @classmethod
+    def published_count(cls):
+        return cache.get_or_set(
+            POSTS_COUNT_CACHE_KEY,
+            lambda: cls.objects.filter(published=True).count(),
+            POSTS_COUNT_CACHE_TIMEOUT
+        )
+
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['published', '-created'], name='post_published_created_idx'),
+            models.Index(fields=['author', 'published', '-created'], name='post_author_published_idx'),
+            models.Index(fields=['published', '-popularity'], name='post_published_popular_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -48,9 +113,51 @@ class Comment(models.Model):
     # anonymous, user, staff
     author_status = models.CharField(max_length=30, default='anonymous')
     active = models.BooleanField(default=True)
+    parent = models.ForeignKey(
+        'self', on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='replies',
+    )
+    # Materialized path: the zero-padded ids of all ancestors and the comment
+    # itself, so ordering by path lists every thread depth first.
+    path = models.CharField(max_length=250, default='', editable=False)
 
     class Meta:
-        ordering = ('created',)
+        ordering = ('path',)
+        indexes = [
+            models.Index(fields=['post', 'active', 'path'], name='comment_post_thread_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Comment, cls).from_db(db, field_names, values)
+        # Lets signal handlers see whether `active` was toggled.
+        instance._loaded_active = instance.__dict__.get('active')
+        return instance
+
+    def clean(self):
+        if self.parent_id and self.post_id and self.parent.post_id != self.post_id:
+            raise ValidationError({'parent': 'The reply must be on the same post as its parent.'})
+
+    def save(self, *args, **kwargs):
+        # The post_save handler updates Post.comment_count in this transaction.
+        with transaction.atomic():
+            super(Comment, self).save(*args, **kwargs)
+            if not self.path:
+                prefix = self.parent.path if self.parent_id else ''
+                self.path = prefix + str(self.pk).zfill(COMMENT_PATH_STEP)
+                Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+    @property
+    def depth(self):
+        return len(self.path) // COMMENT_PATH_STEP - 1
+
+    def can_reply(self):
+        return len(self.path) + COMMENT_PATH_STEP <= self._meta.get_field('path').max_length
+
+    def thread(self):
+        # The comment and all of its replies, as one range scan on the index.
+        return Comment.objects.filter(post_id=self.post_id, path__gte=self.path, path__lt=self.path + ':')
 
     def __str__(self):
         return 'Comment by {} on {}'.format(self.name, self.post)
@@ -59,11 +166,30 @@ class Comment(models.Model):
 class Tag(models.Model):
     title = models.CharField(max_length=50)
     slug = models.SlugField(default='slug', max_length=100, unique=True)
+    # Published posts with this tag, kept up to date by blog.signals.
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('post_count',)
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title)
+        if not self._state.adding and not kwargs.get('update_fields'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
         super(Tag, self).save(*args, **kwargs)
 
+    @classmethod
+    def recount(cls, tag_ids):
+        # Exact counts in one UPDATE, so add, remove, clear and publish
+        # changes need no bookkeeping of which links really changed.
+        published = (Post.tags.through.objects
+                     .filter(tag_id=OuterRef('pk'), post__published=True)
+                     .order_by().values('tag_id').annotate(count=Count('pk')).values('count'))
+        count = Coalesce(Subquery(published, output_field=IntegerField()), 0)
+        return cls.objects.filter(pk__in=tag_ids).update(post_count=count)
+
     def get_absolute_url(self):
         return reverse('tag_detail', kwargs={'slug': self.slug})
 
@@ -72,3 +198,60 @@ class Tag(models.Model):
 
     class Meta:
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title'], name='tag_title_idx'),
+            models.Index(fields=['-post_count', 'title'], name='tag_post_count_idx'),
+        ]
+
+
+class SearchTerm(models.Model):
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    term = models.CharField(max_length=100)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('term', 'post')
+
+    def __str__(self):
+        return '{} in {}'.format(self.term, self.post_id)
+
+
+class RelatedPost(models.Model):
+    # Top related posts of each post, built by blog.related.
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='related_entries',
+    )
+    related = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ('-score',)
+        unique_together = ('post', 'related')
+        indexes = [
+            models.Index(fields=['post', '-score'], name='relatedpost_post_score_idx'),
+        ]
+
+    def __str__(self):
+        return '{} -> {}'.format(self.post_id, self.related_id)
+
+
+class StaleRelatedPost(models.Model):
+    # Posts whose related list is out of date after a tag, publish or delete
+    # change, rebuilt by rebuild_related_posts --stale outside of requests.
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE,
+        primary_key=True, related_name='+',
+    )
+    # The post itself changed, the posts it lists after the rebuild are
+    # queued too.
+    neighbours = models.BooleanField(default=False)
+
+    def __str__(self):
+        return str(self.post_id)
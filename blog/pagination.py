@@ -0,0 +1,156 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _json_default(value):
+    # Full precision, unlike DjangoJSONEncoder which drops microseconds.
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+
+class WindowedPage(Page):
+
+    @property
+    def window(self):
+        return self.paginator.page_window(self.number)
+
+
+class WindowedPaginator(Paginator):
+    # Page links around the current page plus the first and last page, with
+    # None marking a gap, so templates never loop over the whole page_range.
+    on_each_side = 2
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+    def page_window(self, number):
+        last = self.num_pages
+        start = max(number - self.on_each_side, 1)
+        end = min(number + self.on_each_side, last)
+
+        window = []
+        if start > 1:
+            window.append(1)
+            if start > 2:
+                window.append(None)
+        window.extend(range(start, end + 1))
+        if end < last:
+            if end < last - 1:
+                window.append(None)
+            window.append(last)
+        return window
+
+
+class CursorPage:
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page of {} items>'.format(len(self.object_list))
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    # Keyset pagination: pages are selected with a WHERE on the ordering
+    # columns of the last seen row, so no OFFSET and no COUNT are needed.
+
+    def __init__(self, queryset, per_page, ordering=('-created', '-id')):
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = int(per_page)
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, name) for name in self.fields]
+        data = json.dumps([direction, values], default=_json_default).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(data.decode())
+            if direction not in (NEXT, PREVIOUS) or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            model = self.queryset.model
+            values = [model._meta.get_field(name).to_python(value)
+                      for name, value in zip(self.fields, values)]
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, ValidationError):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values, backwards, index=0):
+        # Lexicographic "row comes after (values)" in the given ordering, as
+        # a <= A AND (a < A OR (b <= B AND ...)). The outer bound on the
+        # first column lets SQLite use it as an index range, an OR of
+        # "a < A OR (a = A AND b < B)" alone scans from the start.
+        name, field, value = self.ordering[index], self.fields[index], values[index]
+        lookup = 'lt' if name.startswith('-') != backwards else 'gt'
+        after = Q(**{'{}__{}'.format(field, lookup): value})
+        if index == len(self.fields) - 1:
+            return after
+        return Q(**{'{}__{}e'.format(field, lookup): value}) & (after | self._seek(values, backwards, index + 1))
+
+    def page(self, cursor=None):
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+
+        if values is None:
+            rows = list(self.queryset[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        elif direction == NEXT:
+            rows = list(self.queryset.filter(self._seek(values, False))[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, True
+            rows = rows[:self.per_page]
+        else:
+            reverse = self.queryset.filter(self._seek(values, True)).reverse()
+            rows = list(reverse[:self.per_page + 1])
+            has_next, has_previous = True, len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], NEXT)
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], PREVIOUS)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
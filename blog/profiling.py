@@ -0,0 +1,79 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+
+STATS_LINES = 100
+SAMPLE_INTERVAL = 0.005
+
+
+class StackSampler:
+    # Samples the stack of the thread that started it, every interval,
+    # and counts identical stacks. The output is the collapsed format read
+    # by flamegraph.pl and speedscope: "outer;inner;innermost count".
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{} ({})'.format(code.co_name, code.co_filename))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in sorted(self.stacks.items()))
+
+
+def format_stats(profiler, lines=STATS_LINES):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(lines)
+    return stream.getvalue()
+
+
+def save_profile(profiler, directory, name, keep):
+    # Only the newest `keep` profiles are kept in the directory.
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, '{}-{}-{}.prof'.format(time.strftime('%Y%m%d-%H%M%S'), os.getpid(), name))
+    profiler.dump_stats(path)
+
+    profiles = sorted((entry for entry in os.scandir(directory) if entry.name.endswith('.prof')),
+                      key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in profiles[keep:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+    return path
+
+
+def profile(func):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func()
+    finally:
+        profiler.disable()
+    return profiler, result
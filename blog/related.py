@@ -0,0 +1,117 @@
+from collections import Counter
+
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+
+RELATED_POSTS = 5
+# Candidates are the posts most recently given each of the post's tags.
+CANDIDATES_PER_TAG = 200
+# A post this many days old counts half as much as a brand new one.
+RECENCY_HALF_LIFE_DAYS = 30
+
+
+def related_scores(post_model, post_id, now=None, limit=RELATED_POSTS):
+    # Each tag reads a bounded range of its index instead of grouping every
+    # post that shares a popular tag.
+    now = now or timezone.now()
+    through = post_model.tags.through
+    shared = Counter()
+    for tag_id in through.objects.filter(post_id=post_id).values_list('tag_id', flat=True):
+        shared.update(through.objects.filter(tag_id=tag_id).exclude(post_id=post_id)
+                      .order_by('-pk').values_list('post_id', flat=True)[:CANDIDATES_PER_TAG])
+    candidates = post_model.objects.filter(pk__in=list(shared), published=True).values_list('pk', 'created')
+
+    scores = []
+    for pk, created in candidates:
+        age_days = max((now - created).total_seconds(), 0) / 86400
+        scores.append((shared[pk] * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS), pk))
+    scores.sort(reverse=True)
+    return [(pk, score) for score, pk in scores[:limit]]
+
+
+def build_related(post_model, related_model, post_id, now=None):
+    # Returns True when the stored list changed.
+    scores = related_scores(post_model, post_id, now)
+    current = list(related_model.objects.filter(post_id=post_id).values_list('related_id', flat=True))
+    with transaction.atomic():
+        related_model.objects.filter(post_id=post_id).delete()
+        related_model.objects.bulk_create(
+            related_model(post_id=post_id, related_id=pk, score=score) for pk, score in scores
+        )
+    return current != [pk for pk, score in scores]
+
+
+def rebuild_related(post_model, related_model, batch_size=500, now=None):
+    # Takes the models as arguments so migrations can pass the historical ones.
+    now = now or timezone.now()
+    built = 0
+    last_pk = 0
+    while True:
+        ids = list(post_model.objects.filter(pk__gt=last_pk).order_by('pk')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return built
+        with transaction.atomic():
+            for pk in ids:
+                build_related(post_model, related_model, pk, now)
+        built += len(ids)
+        last_pk = ids[-1]
+
+
+def touch_related_owners(post_ids):
+    # Posts whose related list changed show it on their pages.
+    from .cache import invalidate_paths
+    from .models import Post
+
+    if post_ids:
+        posts = Post.objects.filter(pk__in=post_ids)
+        posts.update(updated=timezone.now())
+        invalidate_paths([reverse('post_detail', args=[slug]) for slug in posts.values_list('slug', flat=True)])
+
+
+def mark_stale(post_ids, neighbours=True):
+    # Called from signals inside the writer's transaction, so it only queues
+    # the posts for refresh_stale(). With neighbours, the posts that list
+    # them or are listed by them are queued too, their overlap has changed,
+    # and so are the posts they list once rebuilt.
+    from .models import Post, RelatedPost, StaleRelatedPost
+
+    post_ids = set(post_ids)
+    if not post_ids:
+        return
+    stale = set(post_ids)
+    if neighbours:
+        listed = RelatedPost.objects.order_by()
+        stale |= set(listed.filter(related_id__in=post_ids).values_list('post_id', flat=True))
+        stale |= set(listed.filter(post_id__in=post_ids).values_list('related_id', flat=True))
+    # Posts deleted in the same cascade are gone already.
+    existing = Post.objects.filter(pk__in=stale).order_by().values_list('pk', flat=True)
+    StaleRelatedPost.objects.bulk_create((StaleRelatedPost(post_id=pk) for pk in existing), ignore_conflicts=True)
+    if neighbours:
+        StaleRelatedPost.objects.filter(pk__in=post_ids).update(neighbours=True)
+
+
+def refresh_stale(batch_size=500, now=None):
+    # Rebuilds the queued posts, each in its own short transaction.
+    # Everything else is left to a full rebuild_related_posts run.
+    from .models import Post, RelatedPost, StaleRelatedPost
+
+    refreshed = 0
+    while True:
+        batch = list(StaleRelatedPost.objects.order_by('pk').values_list('pk', 'neighbours')[:batch_size])
+        if not batch:
+            return refreshed
+        # Posts marked again while this batch is rebuilt are queued anew.
+        StaleRelatedPost.objects.filter(pk__in=[pk for pk, neighbours in batch]).delete()
+        changed = set()
+        for pk, neighbours in batch:
+            if build_related(Post, RelatedPost, pk, now):
+                changed.add(pk)
+            if neighbours:
+                listed = RelatedPost.objects.filter(post_id=pk).order_by().values_list('related_id', flat=True)
+                StaleRelatedPost.objects.bulk_create((StaleRelatedPost(post_id=related_id) for related_id in listed),
+                                                     ignore_conflicts=True)
+        touch_related_owners(changed)
+        refreshed += len(batch)
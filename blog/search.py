@@ -0,0 +1,172 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.utils import OperationalError
+from django.utils.functional import cached_property
+from pytils.translit import slugify
+
+
+FTS_TABLE = 'blog_post_fts'
+TITLE_WEIGHT = 3
+BODY_WEIGHT = 1
+MAX_TERM_LENGTH = 100
+RESULTS_LIMIT = 1000
+
+
+def tokenize(text):
+    # pytils slugify transliterates Cyrillic and lowercases, so indexed
+    # terms and query terms are normalized the same way as post slugs.
+    return [token[:MAX_TERM_LENGTH] for token in slugify(text or '').split('-') if token]
+
+
+def _remember_fts(using, available):
+    # Keyed by database name, the test runner swaps it on the same wrapper.
+    using.blog_fts_available = (using.settings_dict['NAME'], available)
+
+
+def fts_available():
+    if connection.vendor != 'sqlite':
+        return False
+    if getattr(settings, 'BLOG_SEARCH_BACKEND', 'auto') == 'index':
+        return False
+    name, available = getattr(connection, 'blog_fts_available', (None, None))
+    if name == connection.settings_dict['NAME']:
+        return available
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        available = cursor.fetchone() is not None
+    _remember_fts(connection, available)
+    return available
+
+
+def create_fts_table(using=connection):
+    if using.vendor != 'sqlite':
+        return False
+    try:
+        with using.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5(title, body)".format(FTS_TABLE))
+    except OperationalError:
+        # SQLite was built without FTS5, the term index is used instead.
+        _remember_fts(using, False)
+        return False
+    _remember_fts(using, True)
+    return True
+
+
+def drop_fts_table(using=connection):
+    if using.vendor == 'sqlite':
+        with using.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS {}".format(FTS_TABLE))
+        _remember_fts(using, False)
+
+
+def _weigh(title_tokens, body_tokens):
+    weights = Counter()
+    for token in title_tokens:
+        weights[token] += TITLE_WEIGHT
+    for token in body_tokens:
+        weights[token] += BODY_WEIGHT
+    return weights
+
+
+def build_terms(title, body):
+    return _weigh(tokenize(title), tokenize(body))
+
+
+def index_post(post, use_fts=None):
+    from .models import SearchTerm
+
+    if use_fts is None:
+        use_fts = fts_available()
+
+    # Transliteration dominates indexing, so each text is tokenized once.
+    title_tokens, body_tokens = tokenize(post.title), tokenize(post.body)
+    with transaction.atomic():
+        SearchTerm.objects.filter(post_id=post.pk).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(post_id=post.pk, term=term, weight=weight)
+            for term, weight in _weigh(title_tokens, body_tokens).items()
+        )
+        if use_fts:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM {} WHERE rowid = %s".format(FTS_TABLE), [post.pk])
+                cursor.execute(
+                    "INSERT INTO {} (rowid, title, body) VALUES (%s, %s, %s)".format(FTS_TABLE),
+                    [post.pk, ' '.join(title_tokens), ' '.join(body_tokens)]
+                )
+
+
+def remove_post(post_id):
+    # SearchTerm rows go away with the post through the foreign key cascade.
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM {} WHERE rowid = %s".format(FTS_TABLE), [post_id])
+
+
+def search(query, limit=RESULTS_LIMIT):
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+    if fts_available():
+        return _search_fts(terms, limit)
+    return _search_index(terms, limit)
+
+
+def _search_fts(terms, limit):
+    match = ' AND '.join('"{}"'.format(term) for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT {fts}.rowid FROM {fts} "
+            "INNER JOIN blog_post ON blog_post.id = {fts}.rowid "
+            "WHERE {fts} MATCH %s AND blog_post.published "
+            "ORDER BY bm25({fts}, %s, %s), blog_post.created DESC "
+            "LIMIT %s".format(fts=FTS_TABLE),
+            [match, float(TITLE_WEIGHT), float(BODY_WEIGHT), limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_index(terms, limit):
+    from .models import SearchTerm
+
+    ranked = (SearchTerm.objects
+              .filter(term__in=terms, post__published=True)
+              .values('post_id')
+              .annotate(score=Sum('weight'), matched=Count('term'))
+              .filter(matched=len(terms))
+              .order_by('-score', '-post__created')
+              .values_list('post_id', flat=True))
+    return list(ranked[:limit])
+
+
+class SearchResults:
+    # Sequence of ranked posts for Paginator: only the ids of the requested
+    # page are loaded, in rank order, from the given queryset. Matches outside
+    # the queryset (another author's or tag's posts) are left out of the
+    # count. Pass up to limit + 1 ids, `truncated` tells whether there were
+    # more matches than the limit.
+
+    def __init__(self, ids, queryset, limit=None):
+        limit = RESULTS_LIMIT if limit is None else limit
+        self.truncated = len(ids) > limit
+        self.all_ids = ids[:limit]
+        self.queryset = queryset
+
+    @cached_property
+    def ids(self):
+        if not self.all_ids:
+            return []
+        found = set(self.queryset.filter(pk__in=self.all_ids).values_list('pk', flat=True))
+        return [pk for pk in self.all_ids if pk in found]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        ids = self.ids[key]
+        if not isinstance(key, slice):
+            return self.queryset.get(pk=ids)
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,225 @@
+import threading
+
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+
+from . import related, search, slow_queries
+from .cache import invalidate_paths
+from .models import Comment, Post, RelatedPost, Tag, POSTS_COUNT_CACHE_KEY
+
+
+# Posts being deleted by this thread. Their comments are deleted with them,
+# and the per-comment handlers have nothing left to update.
+_deleting = threading.local()
+
+
+def deleting_post_ids():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+@receiver(pre_delete, sender=Post)
+def mark_post_deleting(sender, instance, **kwargs):
+    deleting_post_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unmark_post_deleting(sender, instance, **kwargs):
+    deleting_post_ids().discard(instance.pk)
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    slow_queries.install(connection)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def reset_posts_count(sender, **kwargs):
+    cache.delete(POSTS_COUNT_CACHE_KEY)
+
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {'title', 'body'} & set(update_fields):
+        return
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+def change_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(comment_count=F('comment_count') + delta, updated=timezone.now())
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        delta = int(instance.active)
+    else:
+        delta = int(instance.active) - int(getattr(instance, '_loaded_active', instance.active))
+    if delta:
+        change_comment_count(instance.post_id, delta)
+    elif not created:
+        # An edited comment changes the post page, its ETag follows updated.
+        Post.objects.filter(pk=instance.post_id).update(updated=timezone.now())
+    instance._loaded_active = instance.active
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id in deleting_post_ids():
+        return
+    if getattr(instance, '_loaded_active', instance.active):
+        change_comment_count(instance.post_id, -1)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def touch_posts_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            Post.objects.filter(pk=instance.pk).update(updated=timezone.now())
+    elif action in ('post_add', 'post_remove'):
+        Post.objects.filter(pk__in=pk_set).update(updated=timezone.now())
+    elif action == 'pre_clear':
+        instance.posts.update(updated=timezone.now())
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def mark_related_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            related.mark_stale({instance.pk})
+    elif action in ('post_add', 'post_remove'):
+        related.mark_stale(pk_set)
+    elif action == 'pre_clear':
+        instance._cleared_post_ids = set(instance.posts.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        related.mark_stale(getattr(instance, '_cleared_post_ids', set()))
+
+
+@receiver(post_save, sender=Post)
+def mark_related_on_publish(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    if not created and 'published' in loaded and loaded['published'] != instance.published:
+        related.mark_stale({instance.pk})
+
+
+@receiver(pre_delete, sender=Post)
+def remember_related_owners(sender, instance, **kwargs):
+    instance._related_owner_ids = set(
+        RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def mark_related_on_delete(sender, instance, **kwargs):
+    # The rows listing the deleted post are gone with it. Those pages drop
+    # the link now, the lists are refilled with the other stale posts.
+    owners = getattr(instance, '_related_owner_ids', set()) - {instance.pk}
+    related.mark_stale(owners, neighbours=False)
+    related.touch_related_owners(owners)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def count_tag_posts_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove') and instance.published:
+            Tag.recount(pk_set)
+        elif action == 'pre_clear':
+            instance._cleared_tag_ids = set(instance.tags.values_list('pk', flat=True))
+        elif action == 'post_clear':
+            Tag.recount(getattr(instance, '_cleared_tag_ids', set()))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        Tag.recount([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+def count_tag_posts_on_publish(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    if not created and 'published' in loaded and loaded['published'] != instance.published:
+        Tag.recount(instance.tags.values('pk'))
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    instance._deleted_tag_ids = set(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def count_tag_posts_on_delete(sender, instance, **kwargs):
+    Tag.recount(getattr(instance, '_deleted_tag_ids', set()))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_posts_of_tag(sender, instance, **kwargs):
+    # Post cards show tag titles.
+    Post.objects.filter(tags=instance).update(updated=timezone.now())
+
+
+def feed_paths(post, tag_slugs=()):
+    # Pages that show this post: its own page and the feeds listing it.
+    paths = [reverse('home'), post.get_absolute_url(), reverse('post_comments', args=[post.slug]),
+             reverse('posts_by_author', args=[post.author.username])]
+    paths.extend(reverse('tag_detail', args=[slug]) for slug in tag_slugs)
+    return paths
+
+
+def post_tag_slugs(post):
+    return list(Tag.objects.filter(posts=post).values_list('slug', flat=True))
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    paths = feed_paths(instance, post_tag_slugs(instance))
+    loaded_slug = getattr(instance, '_loaded_values', {}).get('slug')
+    if loaded_slug and loaded_slug != instance.slug:
+        paths.append(reverse('post_detail', args=[loaded_slug]))
+        paths.append(reverse('post_comments', args=[loaded_slug]))
+    invalidate_paths(paths)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    # invalidate_post_pages already covers the comments of a deleted post.
+    if instance.post_id in deleting_post_ids():
+        return
+    post = Post.objects.select_related('author').filter(pk=instance.post_id).first()
+    if post:
+        invalidate_paths(feed_paths(post, post_tag_slugs(post)))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_tagged_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        slugs = post_tag_slugs(instance) if action == 'pre_clear' else \
+            Tag.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+        invalidate_paths(feed_paths(instance, slugs))
+    else:
+        posts = instance.posts.all() if action == 'pre_clear' else Post.objects.filter(pk__in=pk_set)
+        paths = [instance.get_absolute_url()]
+        for post in posts.select_related('author'):
+            paths.extend(feed_paths(post))
+        invalidate_paths(paths)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_tag_pages(sender, instance, **kwargs):
+    authors = (Post.objects.filter(tags=instance)
+               .values_list('author__username', flat=True).distinct())
+    invalidate_paths([reverse('home'), reverse('tag_list'), instance.get_absolute_url()]
+                     + [reverse('posts_by_author', args=[author]) for author in authors])
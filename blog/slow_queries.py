@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+
+SLOW_QUERY_MS = 100
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDERS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    # Literals and placeholders become ?, and IN lists of any length look
+    # the same, so the same query from the same code has one fingerprint.
+    sql = STRING.sub('?', sql.replace('%s', '?'))
+    sql = NUMBER.sub('?', sql)
+    sql = PLACEHOLDERS.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:16]
+
+
+def set_view(name):
+    _local.view = name
+
+
+def current_view():
+    return getattr(_local, 'view', None)
+
+
+def explain(connection, sql, params):
+    # Runs on the database cursor under Django's wrapper, so the EXPLAIN is
+    # not counted by request timings or metrics, nor explained in turn.
+    try:
+        with connection.cursor() as cursor:
+            cursor.cursor.execute(connection.ops.explain_query_prefix() + ' ' + sql, params)
+            return [row[-1] for row in cursor.cursor.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def write(entry):
+    path = getattr(settings, 'BLOG_SLOW_QUERY_LOG', None)
+    if not path:
+        return
+    line = json.dumps(entry, sort_keys=True) + '\n'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _write_lock, open(path, 'a') as f:
+        f.write(line)
+
+
+def slow_query_log(execute, sql, params, many, context):
+    if not getattr(settings, 'BLOG_SLOW_QUERY_LOG', None):
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = (time.perf_counter() - started) * 1000
+    if elapsed >= getattr(settings, 'BLOG_SLOW_QUERY_MS', SLOW_QUERY_MS):
+        plan = None
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            plan = explain(context['connection'], sql, params)
+        write({
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(elapsed, 3),
+            'fingerprint': fingerprint(sql),
+            'normalized': normalize(sql),
+            'sql': sql,
+            'view': current_view(),
+            'plan': plan,
+        })
+    return result
+
+
+def install(connection):
+    # connection_created fires on every reconnect of the same connection.
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_log)
+
+
+def read_log(path):
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def aggregate(entries):
+    # Fingerprints by total time, each with the plan of its slowest run.
+    report = {}
+    for entry in entries:
+        row = report.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'], 'normalized': entry['normalized'],
+            'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': set(), 'plan': None,
+        })
+        row['count'] += 1
+        row['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= row['max_ms']:
+            row['max_ms'] = entry['duration_ms']
+            row['plan'] = entry.get('plan')
+        if entry.get('view'):
+            row['views'].add(entry['view'])
+    rows = sorted(report.values(), key=lambda row: row['total_ms'], reverse=True)
+    for row in rows:
+        row['mean_ms'] = row['total_ms'] / row['count']
+        row['views'] = sorted(row['views'])
+    return rows
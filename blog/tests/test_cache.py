@@ -0,0 +1,113 @@
+import tempfile
+import threading
+import time
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+
+from blog.cache import AtomicFileBasedCache, StaleWhileRevalidateCache
+
+
+class StaleWhileRevalidateCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.page_cache = StaleWhileRevalidateCache(grace=30, poll_interval=0.01)
+        self.builds = 0
+        self.builds_lock = threading.Lock()
+
+    def slow_build(self, value, started=None, release=None):
+        def build():
+            with self.builds_lock:
+                self.builds += 1
+            if started:
+                started.set()
+            if release:
+                release.wait(5)
+            else:
+                time.sleep(0.2)
+            return value
+        return build
+
+    def run_threads(self, count, target):
+        results = []
+        barrier = threading.Barrier(count)
+
+        def worker():
+            barrier.wait()
+            results.append(target())
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_build_once(self):
+        results = self.run_threads(8, lambda: self.page_cache.get_or_build('key', self.slow_build('page'), 60))
+        self.assertEqual(results, ['page'] * 8)
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(self.page_cache.stats(), {'hits': 0, 'misses': 1, 'stale': 0, 'coalesced': 7})
+
+    def test_stale_copy_is_served_while_one_worker_rebuilds(self):
+        self.page_cache.get_or_build('key', lambda: 'old', 60)
+        version = time.time()
+        started, release = threading.Event(), threading.Event()
+        rebuild = threading.Thread(target=self.page_cache.get_or_build,
+                                   args=('key', self.slow_build('new', started, release), 60, version))
+        rebuild.start()
+        started.wait(5)
+
+        results = self.run_threads(
+            5, lambda: self.page_cache.get_or_build('key', self.slow_build('other'), 60, version))
+        release.set()
+        rebuild.join()
+
+        self.assertEqual(results, ['old'] * 5)
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(self.page_cache.get_or_build('key', lambda: 'unused', 60, version), 'new')
+        self.assertEqual(self.page_cache.stats(), {'hits': 1, 'misses': 2, 'stale': 5, 'coalesced': 0})
+
+    def test_stale_copy_past_grace_is_rebuilt(self):
+        self.page_cache.grace = 0
+        self.page_cache.get_or_build('key', lambda: 'old', 60)
+        version = time.time()
+        self.page_cache.cache.add('key:lock', 1)
+        time.sleep(0.01)
+        self.assertEqual(self.page_cache.get_or_build('key', lambda: 'new', 60, version), 'new')
+
+    def test_uncacheable_result_is_not_stored(self):
+        self.assertIsNone(self.page_cache.get_or_build('key', lambda: None, 60))
+        self.assertEqual(self.page_cache.get_or_build('key', lambda: 'page', 60), 'page')
+        self.assertEqual(self.page_cache.stats()['misses'], 2)
+
+
+class AtomicFileBasedCacheTests(SimpleTestCase):
+
+    def test_concurrent_adds_succeed_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            results = []
+            start = threading.Event()
+
+            def worker():
+                # Each backend instance opens its own lock file descriptor,
+                # like separate worker processes do.
+                backend = AtomicFileBasedCache(directory, {})
+                start.wait()
+                results.append(backend.add('lock', 1, 10))
+
+            threads = [threading.Thread(target=worker) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            start.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results.count(True), 1)
+
+
+class IsolatedCacheTests(SimpleTestCase):
+
+    def test_tests_do_not_use_the_shared_cache(self):
+        self.assertIsInstance(caches['default'], LocMemCache)
@@ -0,0 +1,169 @@
+import datetime
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+
+from blog.models import Comment, Post, Tag
+
+
+class CheckQueryPlansTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.tag = Tag.objects.create(title='django')
+        for i in range(5):
+            post = Post.objects.create(
+                title='Django post {}'.format(i),
+                body='Django content',
+                author=self.user
+            )
+            post.tags.set([self.tag])
+            Comment.objects.create(post=post, name='tester',
+                                   email='test@test.com', body='Comment')
+
+    def test_view_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out, stderr=StringIO(), verbosity=2)
+        self.assertIn('All view queries use indexes', out.getvalue())
+
+    def test_full_scan_fails(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX post_published_created_idx')
+            cursor.execute('DROP INDEX post_published_popular_idx')
+        with self.assertRaises(CommandError):
+            call_command('check_query_plans', stdout=StringIO(), stderr=StringIO())
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=60)
+    def test_second_run_checks_the_same_queries(self):
+        outputs = []
+        for i in range(2):
+            out = StringIO()
+            call_command('check_query_plans', stdout=out, stderr=StringIO(), verbosity=2)
+            outputs.append(sorted(line for line in out.getvalue().splitlines() if line.startswith('ok')))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertTrue([line for line in outputs[1] if line.startswith('ok   /  SELECT COUNT(*)')])
+
+
+class RecountCommentsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.post = Post.objects.create(title='Post', body='Content', author=self.user)
+        self.other = Post.objects.create(title='Other', body='Content', author=self.user)
+        for active in (True, True, False):
+            Comment.objects.create(post=self.post, name='tester', email='test@test.com',
+                                   body='Comment', active=active)
+
+    def test_repairs_drift(self):
+        past = timezone.now() - datetime.timedelta(days=1)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=10, updated=past)
+        Post.objects.filter(pk=self.other.pk).update(comment_count=3, updated=past)
+        out = StringIO()
+        call_command('recount_comments', batch_size=1, stdout=out)
+        self.assertIn('of 2 posts', out.getvalue())
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(self.other.comment_count, 0)
+        # Cached cards and ETags are keyed on updated.
+        self.assertGreater(self.post.updated, past)
+        self.assertGreater(self.other.updated, past)
+
+
+class RecountTagsTests(TestCase):
+
+    def test_repairs_drift(self):
+        user = get_user_model().objects.create_user(username='testuser', password='secret')
+        tag = Tag.objects.create(title='django')
+        Post.objects.create(title='Post', body='Content', author=user).tags.add(tag)
+        Tag.objects.filter(pk=tag.pk).update(post_count=7)
+        out = StringIO()
+        call_command('recount_tags', stdout=out)
+        self.assertIn('of 1 tags', out.getvalue())
+        tag.refresh_from_db()
+        self.assertEqual(tag.post_count, 1)
+
+
+class BenchmarkTagFilterTests(TestCase):
+
+    def test_reports_timings_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_tag_filter', posts=50, tags=10, repeat=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(lines[-1].lstrip().startswith('5  any'))
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+
+class SeedBlogTests(TestCase):
+
+    def seed(self):
+        call_command('seed_blog', users=3, tags=5, posts=20, comments=60, index=False, stdout=StringIO())
+
+    def test_creates_consistent_data(self):
+        self.seed()
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(Tag.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(Comment.objects.count(), 60)
+        for post in Post.objects.all():
+            self.assertEqual(post.comment_count, post.comments.filter(active=True).count())
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.post_count, tag.posts.filter(published=True).count())
+        for reply in Comment.objects.filter(parent__isnull=False).select_related('parent'):
+            self.assertEqual(reply.post_id, reply.parent.post_id)
+            self.assertTrue(reply.path.startswith(reply.parent.path))
+            self.assertGreaterEqual(reply.created, reply.parent.created)
+        for comment in Comment.objects.select_related('post'):
+            self.assertGreaterEqual(comment.created, comment.post.created)
+
+    def test_same_seed_gives_same_data(self):
+        self.seed()
+        first = self.snapshot()
+        Post.objects.all().delete()
+        Comment.objects.all().delete()
+        Tag.objects.all().delete()
+        get_user_model().objects.all().delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), first)
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list('title', 'created', 'updated', 'comment_count',
+                                                         'popularity')),
+            list(Comment.objects.order_by('pk').values_list('body', 'created')),
+            list(get_user_model().objects.order_by('pk').values_list('username', 'date_joined')),
+        )
+
+
+class RenderPostBodiesTests(TestCase):
+
+    def test_backfills_rendered_columns(self):
+        user = get_user_model().objects.create_user(username='testuser', password='secret')
+        for i in range(3):
+            Post.objects.create(title='Post {}'.format(i), body='Line\nbreak', author=user)
+        past = timezone.now() - datetime.timedelta(days=1)
+        Post.objects.update(updated=past)
+        Post.objects.filter(title='Post 0').update(body_html='', excerpt='')
+
+        out = StringIO()
+        call_command('render_post_bodies', batch_size=2, stdout=out)
+        self.assertIn('Rendered 3 posts', out.getvalue())
+        self.assertEqual(Post.objects.filter(body_html='<p>Line<br>break</p>',
+                                             excerpt='Line break').count(), 3)
+        # Only the re-rendered post is marked as changed.
+        self.assertEqual(list(Post.objects.filter(updated__gt=past).values_list('title', flat=True)), ['Post 0'])
@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import threading
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+from blog import metrics
+from blog.models import Post
+
+
+class MetricTests(TestCase):
+
+    def test_counter_is_thread_safe(self):
+        counter = metrics.Counter('test_total', 'Test.', ('view',))
+
+        def work():
+            for _ in range(1000):
+                counter.inc(view='home')
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.snapshot()['values'], [[['home'], 8000]])
+
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('view',), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value, view='home')
+        text = metrics.render(metrics.merge([{'test_seconds': histogram.snapshot()}]))
+        self.assertEqual(text.splitlines(), [
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="home",le="0.1"} 2',
+            'test_seconds_bucket{view="home",le="1"} 3',
+            'test_seconds_bucket{view="home",le="+Inf"} 4',
+            'test_seconds_sum{view="home"} 2.65',
+            'test_seconds_count{view="home"} 4',
+        ])
+
+    def test_label_values_are_escaped(self):
+        counter = metrics.Counter('test_total', 'Test.', ('path',))
+        counter.inc(path='a"b\\c\n')
+        text = metrics.render(metrics.merge([{'test_total': counter.snapshot()}]))
+        self.assertIn('test_total{path="a\\"b\\\\c\\n"} 1', text)
+
+
+class MetricsViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.post = Post.objects.create(title='Test post', body='Content', author=self.user)
+
+    def test_requests_are_counted_by_url_name(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+        self.client.get(self.post.get_absolute_url())
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('blog_requests_total{view="home",method="GET",status="200"} 2', text)
+        self.assertIn('blog_request_duration_seconds_count{view="post_detail"} 1', text)
+        self.assertIn('blog_request_queries_bucket{view="home",le="+Inf"} 2', text)
+        self.assertIn('blog_page_cache_hit_ratio', text)
+
+    def test_comment_submissions(self):
+        url = self.post.get_absolute_url()
+        self.client.post(url, {'name': 'Reader', 'email': 'reader@example.com', 'body': 'Nice'})
+        self.client.post(url, {'name': 'Reader', 'email': 'not an email', 'body': 'Nice'})
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('blog_comments_submitted_total{result="accepted"} 1', text)
+        self.assertIn('blog_comments_submitted_total{result="invalid"} 1', text)
+
+    def test_process_alive_checks_start_time(self):
+        started = metrics.process_start(os.getpid())
+        self.assertTrue(metrics.process_alive(os.getpid(), started))
+        self.assertFalse(metrics.process_alive(os.getpid(), started + 1))
+
+    def test_worker_files_are_added_up(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # A worker that is gone and had the same pid.
+            with open(os.path.join(directory, 'metrics-{}-0.json'.format(os.getpid())), 'w') as f:
+                json.dump({'blog_comments_submitted_total': {
+                    'kind': 'counter', 'help': 'Comment form submissions by result.',
+                    'labels': ['result'], 'values': [[['accepted'], 3]],
+                }}, f)
+            with override_settings(BLOG_METRICS_DIR=directory):
+                metrics.comments_submitted.inc(result='accepted')
+                text = self.client.get(reverse('metrics')).content.decode()
+                again = self.client.get(reverse('metrics')).content.decode()
+            snapshots = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+        self.assertEqual(snapshots, sorted([os.path.basename(metrics.snapshot_writer.path(directory)),
+                                            metrics.RETIRED_SNAPSHOT]))
+        self.assertIn('blog_comments_submitted_total{result="accepted"} 4', text)
+        self.assertIn('blog_comments_submitted_total{result="accepted"} 4', again)
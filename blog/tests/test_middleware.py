@@ -0,0 +1,74 @@
+import json
+import re
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+from blog import timing
+from blog.models import Post
+
+
+SERVER_TIMING = re.compile(r'^db;dur=[\d.]+;desc="(\d+) queries", tpl;dur=([\d.]+), '
+                           r'view;dur=[\d.]+, total;dur=[\d.]+$')
+
+
+class RequestTimingsTests(TestCase):
+
+    def test_template_time_excludes_queries(self):
+        timings = timing.RequestTimings()
+        template = engines['django'].from_string('{% for user in users %}{{ user }}{% endfor %}')
+        timing.activate(timings)
+        try:
+            with connection.execute_wrapper(timings):
+                template.render({'users': get_user_model().objects.all()})
+        finally:
+            timing.deactivate()
+        self.assertEqual(timings.queries, 1)
+        self.assertIn('SELECT', timings.sql[0][1])
+        self.assertGreater(timings.template_time, 0)
+
+    def test_renders_are_not_timed_outside_requests(self):
+        template = engines['django'].from_string('{{ value }}')
+        self.assertIsInstance(template, timing.TimedTemplate)
+        self.assertEqual(template.render({'value': 'ok'}), 'ok')
+
+
+class RequestTimingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.post = Post.objects.create(title='Test post', body='Content', author=self.user)
+
+    def test_server_timing_header(self):
+        with self.assertLogs('blog.timing', 'INFO') as logs:
+            response = self.client.get(reverse('home'))
+        match = SERVER_TIMING.match(response['Server-Timing'])
+        self.assertIsNotNone(match)
+        self.assertGreater(int(match.group(1)), 0)
+        self.assertGreater(float(match.group(2)), 0)
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'home')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], int(match.group(1)))
+
+    @override_settings(BLOG_SLOW_REQUEST_QUERIES=0)
+    def test_slow_request_is_logged_with_sql(self):
+        with self.assertLogs('blog.timing', 'WARNING') as logs:
+            self.client.get(self.post.get_absolute_url())
+        self.assertIn('Slow request GET ' + self.post.get_absolute_url(), logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(BLOG_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_timed(self):
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -0,0 +1,34 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MigrationTests(TransactionTestCase):
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(target)
+        return executor.loader.project_state(target).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_existing_rows_survive_every_migration(self):
+        apps = self.migrate([('blog', '0007_auto_20200404_1512')])
+        User = apps.get_model('auth', 'User')
+        user = User.objects.create(username='testuser', email='test@email.com', password='secret')
+        post = apps.get_model('blog', 'Post').objects.create(
+            title='Title', slug='title', body='Line\nbreak', author=user)
+        tag = apps.get_model('blog', 'Tag').objects.create(title='Tag', slug='tag')
+        post.tags.add(tag)
+        apps.get_model('blog', 'Comment').objects.create(
+            post=post, name='tester', email='test@test.com', body='Comment')
+
+        executor = MigrationExecutor(connection)
+        apps = self.migrate(executor.loader.graph.leaf_nodes())
+        post = apps.get_model('blog', 'Post').objects.get(pk=post.pk)
+        self.assertEqual(post.body_html, '<p>Line<br>break</p>')
+        self.assertEqual(post.excerpt, 'Line break')
+        self.assertEqual(post.comment_count, 1)
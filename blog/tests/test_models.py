@@ -2,7 +2,11 @@ import tempfile
 from PIL import Image
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
 
 from blog.models import Post, Tag, Comment
@@ -77,6 +81,21 @@ class PostModelTests(TestCase):
     def test_published(self):
         self.assertTrue(self.post.published)
 
+    def test_rendered_body_and_excerpt(self):
+        post = Post.objects.create(
+            title='Rendered post',
+            body='<b>First</b> line\nsecond line\n\n' + 'word ' * 20,
+            author=self.user
+        )
+        self.assertTrue(post.body_html.startswith('<p>&lt;b&gt;First&lt;/b&gt; line<br>second line</p>'))
+        self.assertEqual(post.excerpt, '<b>First</b> line second line ' + 'word ' * 10 + 'word …')
+
+        post.body = 'Edited'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.body_html, '<p>Edited</p>')
+        self.assertEqual(post.excerpt, 'Edited')
+
 
 class CommentModelTests(TestCase):
     def setUp(self):
@@ -144,6 +163,100 @@ class CommentModelTests(TestCase):
         self.assertEqual(comment.email, self.user.email)
         self.assertEqual(comment.body, 'Comment from user')
 
+    def test_comment_count_on_create(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        Comment.objects.create(post=self.post, name='Test', email='test@test.com',
+                               body='Hidden', active=False)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+    def test_comment_count_on_active_toggle(self):
+        comment = Comment.objects.get(pk=self.comment_from_user.pk)
+        comment.active = False
+        comment.save()
+        comment.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+        comment.active = True
+        comment.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+    def test_comment_count_on_delete(self):
+        self.comment_from_user.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+        Comment.objects.filter(post=self.post).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_post_delete_does_not_count_cascaded_comments(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.post.delete()
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'comment_count' in query['sql'] and query['sql'].startswith('UPDATE')])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_post_save_does_not_overwrite_comment_count(self):
+        post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, name='Test', email='test@test.com',
+                               body='Another')
+        post.title = 'Edited Post'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.title, 'Edited Post')
+        self.assertEqual(post.comment_count, 3)
+
+    def reply(self, parent, body):
+        return Comment.objects.create(post=self.post, parent=parent, name='Test',
+                                      email='test@test.com', body=body)
+
+    def test_replies_are_ordered_depth_first(self):
+        reply = self.reply(self.comment_from_user, 'Reply')
+        nested = self.reply(reply, 'Nested reply')
+        self.assertEqual(reply.path, self.comment_from_user.path + str(reply.pk).zfill(10))
+        self.assertEqual(nested.depth, 2)
+        self.assertEqual(list(Comment.objects.filter(post=self.post)),
+                         [self.comment_from_user, reply, nested, self.comment_from_superuser])
+
+    def test_thread_is_one_range_query(self):
+        reply = self.reply(self.comment_from_user, 'Reply')
+        self.reply(self.comment_from_superuser, 'Other reply')
+        nested = self.reply(reply, 'Nested reply')
+        with self.assertNumQueries(1):
+            thread = list(self.comment_from_user.thread())
+        self.assertEqual(thread, [self.comment_from_user, reply, nested])
+
+    def test_deleting_comment_deletes_replies(self):
+        self.reply(self.reply(self.comment_from_user, 'Reply'), 'Nested reply')
+        self.comment_from_user.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(list(Comment.objects.filter(post=self.post)), [self.comment_from_superuser])
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_reply_must_be_on_the_parents_post(self):
+        other = Post.objects.create(title='Other Post', body='Content', author=self.user)
+        reply = Comment(post=other, parent=self.comment_from_user, name='Test',
+                        email='test@test.com', body='Reply')
+        with self.assertRaises(ValidationError):
+            reply.full_clean()
+
+    def test_admin_cannot_move_comments(self):
+        self.client.login(username='admin', password='supersecret')
+        reply = self.reply(self.comment_from_user, 'Reply')
+        url = reverse('admin:blog_comment_change', args=[reply.pk])
+        response = self.client.post(url, {'post': self.post.pk, 'parent': self.comment_from_superuser.pk,
+                                          'name': 'Test', 'email': 'test@test.com', 'body': 'Edited',
+                                          'author_status': 'user', 'active': 'on'})
+        self.assertEqual(response.status_code, 302)
+        reply.refresh_from_db()
+        self.assertEqual(reply.body, 'Edited')
+        self.assertEqual(reply.parent, self.comment_from_user)
+        self.assertTrue(reply.path.startswith(self.comment_from_user.path))
+
 
 class TagModelTests(TestCase):
 
@@ -160,3 +273,50 @@ class TagModelTests(TestCase):
 
     def test_get_absolute_url(self):
         self.assertEqual(self.tag.get_absolute_url(), '/tag/' + self.tag.slug + '/')
+
+    def post_count(self):
+        self.tag.refresh_from_db()
+        return self.tag.post_count
+
+    def test_post_count_follows_tag_changes(self):
+        user = get_user_model().objects.create_user(username='testuser', password='secret')
+        post = Post.objects.create(title='Post', body='Content', author=user)
+        other = Post.objects.create(title='Other', body='Content', author=user)
+
+        post.tags.add(self.tag)
+        self.tag.posts.add(other)
+        self.assertEqual(self.post_count(), 2)
+        post.tags.remove(self.tag)
+        post.tags.remove(self.tag)
+        self.assertEqual(self.post_count(), 1)
+        other.tags.clear()
+        self.assertEqual(self.post_count(), 0)
+        self.tag.posts.set([post, other])
+        self.assertEqual(self.post_count(), 2)
+        self.tag.posts.clear()
+        self.assertEqual(self.post_count(), 0)
+
+    def test_post_count_follows_publish_toggles_and_deletes(self):
+        user = get_user_model().objects.create_user(username='testuser', password='secret')
+        post = Post.objects.create(title='Post', body='Content', author=user, published=False)
+        post.tags.add(self.tag)
+        self.assertEqual(self.post_count(), 0)
+
+        post.published = True
+        post.save()
+        self.assertEqual(self.post_count(), 1)
+        post.published = False
+        post.save()
+        self.assertEqual(self.post_count(), 0)
+        post.published = True
+        post.save()
+        post.delete()
+        self.assertEqual(self.post_count(), 0)
+
+    def test_tag_save_does_not_overwrite_post_count(self):
+        tag = Tag.objects.get(pk=self.tag.pk)
+        user = get_user_model().objects.create_user(username='testuser', password='secret')
+        Post.objects.create(title='Post', body='Content', author=user).tags.add(self.tag)
+        tag.title = 'Renamed Tag'
+        tag.save()
+        self.assertEqual(self.post_count(), 1)
@@ -0,0 +1,23 @@
+from django.test import SimpleTestCase
+
+
+from blog.pagination import WindowedPaginator
+
+
+class WindowedPaginatorTests(SimpleTestCase):
+
+    def setUp(self):
+        self.paginator = WindowedPaginator(range(100000), 3)
+
+    def test_window_in_the_middle(self):
+        self.assertEqual(self.paginator.page(500).window, [1, None, 498, 499, 500, 501, 502, None, 33334])
+
+    def test_window_at_the_edges(self):
+        self.assertEqual(self.paginator.page(1).window, [1, 2, 3, None, 33334])
+        self.assertEqual(self.paginator.page(33334).window, [1, None, 33332, 33333, 33334])
+
+    def test_no_gap_markers_next_to_first_and_last_page(self):
+        self.assertEqual(self.paginator.page(4).window, [1, 2, 3, 4, 5, 6, None, 33334])
+
+    def test_single_page(self):
+        self.assertEqual(WindowedPaginator([1, 2], 3).page(1).window, [1])
@@ -0,0 +1,123 @@
+import datetime
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+
+from blog.models import Post
+from blog.popularity import ViewCounter, popularity_score, update_popularity, view_counter
+
+
+class PopularityTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        view_counter.flush()
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.first = Post.objects.create(title='First post', body='Content', author=self.user)
+        self.second = Post.objects.create(title='Second post', body='Content', author=self.user)
+        self.third = Post.objects.create(title='Third post', body='Content', author=self.user)
+
+    def views(self):
+        return dict(Post.objects.values_list('title', 'views'))
+
+
+class ViewCounterTests(PopularityTestCase):
+
+    def test_views_are_flushed_at_threshold(self):
+        counter = ViewCounter(interval=3600, threshold=5)
+        for slug in [self.first.slug, self.first.slug, self.second.slug, self.third.slug]:
+            counter.add(slug)
+        self.assertEqual(Post.objects.filter(views__gt=0).count(), 0)
+
+        # second and third post share an increment, so two UPDATEs suffice
+        with CaptureQueriesContext(connection) as queries:
+            counter.add(self.first.slug)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(self.views(), {'First post': 3, 'Second post': 1, 'Third post': 1})
+        self.assertEqual(counter.pending(), {})
+
+    def test_views_are_flushed_after_interval(self):
+        counter = ViewCounter(interval=0, threshold=1000)
+        counter.add(self.first.slug)
+        self.assertEqual(self.views()['First post'], 1)
+
+    def test_failed_flush_keeps_views(self):
+        counter = ViewCounter(interval=3600, threshold=1000)
+        counter.add(self.first.slug)
+        with mock.patch('django.db.models.QuerySet.update', side_effect=OperationalError('locked')):
+            self.assertEqual(counter.flush(), 0)
+        self.assertEqual(counter.pending(), {self.first.slug: 1})
+        self.assertEqual(counter.flush(), 1)
+        self.assertEqual(self.views()['First post'], 1)
+
+    def test_post_save_does_not_overwrite_views(self):
+        post = Post.objects.get(pk=self.first.pk)
+        counter = ViewCounter(interval=0, threshold=1)
+        counter.add(post.slug)
+        post.title = 'Edited post'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.views, 1)
+
+    @override_settings(BLOG_VIEWS_FLUSH_INTERVAL=3600, BLOG_VIEWS_FLUSH_THRESHOLD=1000)
+    def test_detail_views_are_counted_on_cache_hits(self):
+        url = reverse('post_detail', args=[self.first.slug])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.client.get(reverse('post_detail', args=['missing']))
+        self.assertEqual(view_counter.pending(), {self.first.slug: 2})
+
+
+class PopularityTests(PopularityTestCase):
+
+    def test_score_decays_with_age(self):
+        now = timezone.now()
+        fresh = popularity_score(10, 0, now, now)
+        old = popularity_score(10, 0, now - datetime.timedelta(days=2), now)
+        self.assertGreater(fresh, old)
+        self.assertGreater(popularity_score(10, 1, now, now), fresh)
+
+    def test_update_popularity_command(self):
+        Post.objects.filter(pk=self.second.pk).update(views=50)
+        Post.objects.filter(pk=self.third.pk).update(views=10)
+        out = StringIO()
+        call_command('update_popularity', batch_size=2, stdout=out)
+        self.assertIn('Updated popularity of 3 posts', out.getvalue())
+        self.assertEqual(list(Post.objects.order_by('-popularity').values_list('title', flat=True)),
+                         ['Second post', 'Third post', 'First post'])
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_popular_feed_ordering(self):
+        Post.objects.filter(pk=self.second.pk).update(popularity=5)
+        Post.objects.filter(pk=self.first.pk).update(popularity=1)
+        response = self.client.get(reverse('home'), {'order': 'popular'})
+        self.assertEqual(list(response.context['posts']), [self.second, self.first, self.third])
+        self.assertEqual(response.context['order'], 'popular')
+
+        response = self.client.get(reverse('home'), {'order': 'popular', 'cursor': ''})
+        self.assertEqual(list(response.context['posts']), [self.second, self.first, self.third])
+
+        etag = response['ETag']
+        Post.objects.filter(pk=self.third.pk).update(views=1000)
+        update_popularity(Post)
+        response = self.client.get(reverse('home'), {'order': 'popular'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(list(response.context['posts']), [self.third, self.second, self.first])
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_unknown_order_falls_back_to_latest(self):
+        response = self.client.get(reverse('home'), {'order': 'title'})
+        self.assertEqual(list(response.context['posts']), [self.third, self.second, self.first])
+        self.assertIsNone(response.context['order'])
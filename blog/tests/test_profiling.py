@@ -0,0 +1,88 @@
+import os
+import tempfile
+import time
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+from blog.models import Post
+from blog.profiling import StackSampler
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class StackSamplerTests(TestCase):
+
+    def test_collapsed_stacks(self):
+        with StackSampler(interval=0.001) as sampler:
+            busy(0.05)
+        lines = sampler.collapsed().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[-1].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(any(line.split(';')[-1].startswith('busy (') for line in lines))
+
+
+class ProfilerMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.staff = get_user_model().objects.create_superuser(
+            username='staff',
+            email='staff@email.com',
+            password='secret'
+        )
+        self.post = Post.objects.create(title='Test post', body='Content', author=self.user)
+
+    def test_staff_get_cprofile_output(self):
+        self.client.login(username='staff', password='secret')
+        for url in (reverse('home'), self.post.get_absolute_url(), reverse('admin:index')):
+            response = self.client.get(url, {'_profile': 1})
+            self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+            text = response.content.decode()
+            self.assertTrue(text.startswith('GET {}?_profile=1 -> 200'.format(url)))
+            self.assertIn('Ordered by: cumulative time', text)
+
+    def test_staff_get_collapsed_stacks(self):
+        self.client.login(username='staff', password='secret')
+        response = self.client.get(reverse('home'), {'_profile': 'collapsed'})
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        for line in response.content.decode().splitlines():
+            self.assertRegex(line, r'^\S.* \d+$')
+
+    def test_other_users_get_the_page(self):
+        response = self.client.get(reverse('home'), {'_profile': 1})
+        self.assertContains(response, 'Test post')
+        self.client.login(username='testuser', password='secret')
+        response = self.client.get(reverse('home'), {'_profile': 1})
+        self.assertContains(response, 'Test post')
+
+    def test_slow_requests_are_saved_and_rotated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(BLOG_PROFILE_DIR=directory, BLOG_PROFILE_SAMPLE_RATE=1,
+                                   BLOG_PROFILE_SLOW_MS=0, BLOG_PROFILE_KEEP=2):
+                for _ in range(3):
+                    response = self.client.get(self.post.get_absolute_url())
+                    self.assertContains(response, 'Test post')
+                    time.sleep(0.01)
+            profiles = sorted(os.listdir(directory))
+        self.assertEqual(len(profiles), 2)
+        self.assertTrue(all('post_detail' in name and name.endswith('.prof') for name in profiles))
+
+    @override_settings(BLOG_PROFILE_SAMPLE_RATE=1, BLOG_PROFILE_SLOW_MS=60000)
+    def test_fast_requests_are_not_saved(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(BLOG_PROFILE_DIR=directory):
+                self.client.get(reverse('home'))
+            self.assertEqual(os.listdir(directory), [])
@@ -0,0 +1,134 @@
+import datetime
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+
+from blog.models import Post, RelatedPost, StaleRelatedPost, Tag
+from blog.related import related_scores
+
+
+class RelatedPostsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.django = Tag.objects.create(title='django')
+        self.python = Tag.objects.create(title='python')
+        self.sql = Tag.objects.create(title='sql')
+        self.post = self.create_post('Django ORM', [self.django, self.python, self.sql])
+        self.both = self.create_post('Django with python', [self.django, self.python])
+        self.one = self.create_post('Django only', [self.django])
+        self.other = self.create_post('Unrelated', [])
+        self.refresh()
+
+    def refresh(self):
+        call_command('rebuild_related_posts', stale=True, stdout=StringIO())
+
+    def create_post(self, title, tags):
+        post = Post.objects.create(title=title, body='Content', author=self.user)
+        post.tags.set(tags)
+        return post
+
+    def related(self, post):
+        return list(RelatedPost.objects.filter(post=post).values_list('related__title', flat=True))
+
+    def test_ranked_by_shared_tags(self):
+        self.assertEqual(self.related(self.post), ['Django with python', 'Django only'])
+        # equal overlap, the newer post ranks first
+        self.assertEqual(self.related(self.one), ['Django with python', 'Django ORM'])
+        self.assertEqual(self.related(self.other), [])
+
+    def test_recency_breaks_ties_and_decays(self):
+        now = timezone.now()
+        Post.objects.filter(pk=self.both.pk).update(created=now - datetime.timedelta(days=365))
+        scores = dict(related_scores(Post, self.post.pk, now))
+        self.assertGreater(scores[self.one.pk], scores[self.both.pk])
+
+    def test_tag_changes_update_lists(self):
+        self.other.tags.add(self.sql)
+        self.assertEqual(self.related(self.other), [])
+        self.refresh()
+        self.assertEqual(self.related(self.other), ['Django ORM'])
+        self.assertIn('Unrelated', self.related(self.post))
+
+        self.other.tags.remove(self.sql)
+        self.refresh()
+        self.assertEqual(self.related(self.other), [])
+        self.assertNotIn('Unrelated', self.related(self.post))
+
+    def test_reverse_tag_changes_update_lists(self):
+        self.sql.posts.add(self.other)
+        self.refresh()
+        self.assertEqual(self.related(self.other), ['Django ORM'])
+        self.sql.posts.clear()
+        self.refresh()
+        self.assertEqual(self.related(self.other), [])
+
+    def test_unpublished_posts_are_dropped(self):
+        post = Post.objects.get(pk=self.both.pk)
+        post.published = False
+        post.save()
+        self.refresh()
+        self.assertEqual(self.related(self.post), ['Django only'])
+
+    def test_deleted_posts_are_replaced(self):
+        for i in range(4):
+            self.create_post('Extra {}'.format(i), [self.django])
+            self.refresh()
+        self.assertEqual(len(self.related(self.post)), 5)
+        updated = Post.objects.get(pk=self.post.pk).updated
+
+        self.both.delete()
+        self.assertEqual(len(self.related(self.post)), 4)
+        self.assertGreater(Post.objects.get(pk=self.post.pk).updated, updated)
+        self.refresh()
+        self.assertEqual(list(RelatedPost.objects.filter(post=self.post).values_list('related_id', flat=True)),
+                         [pk for pk, score in related_scores(Post, self.post.pk)])
+        self.assertEqual(len(self.related(self.post)), 5)
+        self.assertNotIn('Django with python', self.related(self.post))
+
+    def test_tag_changes_only_queue_posts(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.other.tags.add(self.sql)
+        self.assertFalse([q for q in queries.captured_queries if 'blog_relatedpost"' in q['sql'].split('WHERE')[0]
+                          and not q['sql'].startswith('SELECT')])
+        self.assertEqual(list(StaleRelatedPost.objects.values_list('post_id', 'neighbours')),
+                         [(self.other.pk, True)])
+        updated = Post.objects.get(pk=self.post.pk).updated
+        self.refresh()
+        self.assertFalse(StaleRelatedPost.objects.exists())
+        # Queued once the new list of the changed post was known.
+        self.assertIn('Unrelated', self.related(self.post))
+        self.assertGreater(Post.objects.get(pk=self.post.pk).updated, updated)
+
+    def test_candidates_per_tag_are_capped(self):
+        newest = self.create_post('Newest', [self.django])
+        with mock.patch('blog.related.CANDIDATES_PER_TAG', 1):
+            self.assertEqual({pk for pk, score in related_scores(Post, self.post.pk)},
+                             {newest.pk, self.both.pk})
+
+    def test_rebuild_command(self):
+        RelatedPost.objects.all().delete()
+        out = StringIO()
+        StaleRelatedPost.objects.create(post=self.post)
+        call_command('rebuild_related_posts', batch_size=2, stdout=out)
+        self.assertIn('Rebuilt related posts of 4 posts', out.getvalue())
+        self.assertFalse(StaleRelatedPost.objects.exists())
+        self.assertEqual(self.related(self.post), ['Django with python', 'Django only'])
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_detail_page_lists_related_posts(self):
+        response = self.client.get(reverse('post_detail', args=[self.post.slug]))
+        self.assertEqual([entry.related for entry in response.context['related_posts']],
+                         [self.both, self.one])
+        self.assertContains(response, self.both.get_absolute_url())
@@ -0,0 +1,123 @@
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+from blog import search
+from blog.models import Post, SearchTerm
+
+
+class TokenizeTests(TestCase):
+
+    def test_cyrillic_is_transliterated(self):
+        self.assertEqual(search.tokenize('Привет, Мир!'), ['privet', 'mir'])
+
+    def test_query_and_text_normalize_the_same_way(self):
+        self.assertEqual(search.tokenize('ПРИВЕТ'), search.tokenize('privet'))
+
+    def test_empty_text(self):
+        self.assertEqual(search.tokenize(''), [])
+        self.assertEqual(search.tokenize(None), [])
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.body_match = Post.objects.create(
+            title='Web frameworks',
+            body='Django is a python framework',
+            author=self.user
+        )
+        self.title_match = Post.objects.create(
+            title='Django tips',
+            body='Some useful tips',
+            author=self.user
+        )
+        self.cyrillic = Post.objects.create(
+            title='Привет, мир',
+            body='Первый пост',
+            author=self.user
+        )
+        self.draft = Post.objects.create(
+            title='Django draft',
+            body='Not ready',
+            author=self.user,
+            published=False
+        )
+
+    def test_fts_backend_is_used_on_sqlite(self):
+        self.assertTrue(search.fts_available())
+
+    def test_fts_check_is_cached_per_connection(self):
+        search.fts_available()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(search.fts_available())
+        self.assertEqual(len(queries), 0)
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(search.search('django'), [self.title_match.pk, self.body_match.pk])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(search.search('django python'), [self.body_match.pk])
+
+    def test_cyrillic_query(self):
+        self.assertEqual(search.search('мир'), [self.cyrillic.pk])
+        self.assertEqual(search.search('mir'), [self.cyrillic.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.title_match.title = 'Flask tips'
+        self.title_match.save()
+        self.assertEqual(search.search('django'), [self.body_match.pk])
+        self.assertEqual(search.search('flask'), [self.title_match.pk])
+
+        self.body_match.delete()
+        self.assertEqual(search.search('django'), [])
+        self.assertFalse(SearchTerm.objects.filter(post_id=self.body_match.pk).exists())
+
+    @override_settings(BLOG_SEARCH_BACKEND='index')
+    def test_term_index_fallback(self):
+        self.assertFalse(search.fts_available())
+        self.assertEqual(search.search('django'), [self.title_match.pk, self.body_match.pk])
+        self.assertEqual(search.search('django python'), [self.body_match.pk])
+        self.assertEqual(search.search('мир'), [self.cyrillic.pk])
+
+    def test_search_view_keeps_rank_order(self):
+        response = self.client.get(reverse('home'), {'search': 'django'})
+        self.assertEqual(list(response.context['posts']), [self.title_match, self.body_match])
+
+    def test_rebuild_command(self):
+        SearchTerm.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertTrue(SearchTerm.objects.filter(post=self.title_match, term='django').exists())
+        self.assertEqual(search.search('django'), [self.title_match.pk, self.body_match.pk])
+
+    def test_search_in_author_feed_counts_only_their_posts(self):
+        other = get_user_model().objects.create_user(username='other', password='secret')
+        for i in range(5):
+            Post.objects.create(title='Django news {}'.format(i), body='Text', author=other)
+
+        response = self.client.get(reverse('posts_by_author', args=['testuser']), {'search': 'django'})
+        self.assertEqual(response.context['paginator'].count, 2)
+        self.assertEqual(list(response.context['posts']), [self.title_match, self.body_match])
+        self.assertFalse(response.context['search_truncated'])
+
+    def test_truncated_results_are_shown(self):
+        ids = [self.title_match.pk, self.body_match.pk, self.cyrillic.pk]
+        results = search.SearchResults(ids, Post.objects.all(), limit=2)
+        self.assertTrue(results.truncated)
+        self.assertEqual(len(results), 2)
+
+        with mock.patch('blog.search.RESULTS_LIMIT', 1):
+            response = self.client.get(reverse('home'), {'search': 'django'})
+        self.assertTrue(response.context['search_truncated'])
+        self.assertContains(response, 'Only the best 1 matches are shown')
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+from blog import slow_queries, timing
+from blog.models import Post
+
+
+class NormalizeTests(TestCase):
+
+    def test_literals_and_in_lists(self):
+        self.assertEqual(
+            slow_queries.normalize('SELECT "a" FROM "t"\n WHERE "b" = %s AND "c" IN (%s, %s)  LIMIT 21'),
+            'SELECT "a" FROM "t" WHERE "b" = ? AND "c" IN (...) LIMIT ?')
+        self.assertEqual(slow_queries.normalize("SELECT 1 WHERE x = 'it''s'"), 'SELECT ? WHERE x = ?')
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(slow_queries.fingerprint('SELECT * FROM t WHERE id IN (1, 2, 3)'),
+                         slow_queries.fingerprint('SELECT * FROM t WHERE id IN (%s)'))
+        self.assertNotEqual(slow_queries.fingerprint('SELECT * FROM t WHERE id = 1'),
+                            slow_queries.fingerprint('SELECT * FROM u WHERE id = 1'))
+
+
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@email.com',
+            password='secret'
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self.directory.name, 'slow.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def entries(self):
+        with open(self.log) as f:
+            return [json.loads(line) for line in f]
+
+    def test_installed_once_on_connections(self):
+        self.assertEqual(connection.execute_wrappers.count(slow_queries.slow_query_log), 1)
+        slow_queries.install(connection)
+        self.assertEqual(connection.execute_wrappers.count(slow_queries.slow_query_log), 1)
+
+    def test_slow_statements_are_logged_with_plan_and_view(self):
+        self.client.login(username='testuser', password='secret')
+        with override_settings(BLOG_SLOW_QUERY_MS=0, BLOG_SLOW_QUERY_LOG=self.log):
+            self.client.post(reverse('post_new'), {'title': 'New post', 'body': 'Content'})
+        entries = self.entries()
+        self.assertFalse([entry for entry in entries if entry['sql'].startswith('EXPLAIN')])
+
+        count = [entry for entry in entries
+                 if entry['normalized'].startswith('SELECT COUNT(*) AS "__count" FROM "blog_post"')]
+        self.assertEqual(len(count), 1)
+        self.assertEqual(count[0]['view'], 'post_new')
+        self.assertIn('blog_post', ' '.join(count[0]['plan']))
+        self.assertEqual(count[0]['fingerprint'], slow_queries.fingerprint(count[0]['sql']))
+
+    def test_explain_is_not_counted_by_other_wrappers(self):
+        timings = timing.RequestTimings()
+        with override_settings(BLOG_SLOW_QUERY_MS=0, BLOG_SLOW_QUERY_LOG=self.log):
+            with connection.execute_wrapper(timings):
+                Post.objects.count()
+        self.assertEqual(timings.queries, 1)
+        self.assertIsNotNone(self.entries()[0]['plan'])
+
+    def test_log_directory_is_created(self):
+        log = os.path.join(self.directory.name, 'log', 'slow.jsonl')
+        with override_settings(BLOG_SLOW_QUERY_MS=0, BLOG_SLOW_QUERY_LOG=log):
+            Post.objects.count()
+        self.assertTrue(os.path.exists(log))
+
+    @override_settings(BLOG_SLOW_QUERY_MS=0, BLOG_SLOW_QUERY_LOG=None)
+    def test_nothing_is_explained_without_a_log(self):
+        with mock.patch('blog.slow_queries.explain') as explain:
+            Post.objects.count()
+        explain.assert_not_called()
+
+    def test_fast_statements_are_not_logged(self):
+        with override_settings(BLOG_SLOW_QUERY_MS=60000, BLOG_SLOW_QUERY_LOG=self.log):
+            self.client.get(reverse('home'))
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_report(self):
+        with open(self.log, 'w') as f:
+            for duration, sql in ((5, 'SELECT a FROM t WHERE id = 1'), (7, 'SELECT a FROM t WHERE id = 2'),
+                                  (9, 'SELECT b FROM u')):
+                f.write(json.dumps({'duration_ms': duration, 'sql': sql, 'view': 'home',
+                                    'normalized': slow_queries.normalize(sql),
+                                    'fingerprint': slow_queries.fingerprint(sql),
+                                    'plan': ['SCAN t']}) + '\n')
+
+        out = StringIO()
+        call_command('slow_query_report', log=self.log, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('1. {} x2  total 12.0 ms  mean 6.0 ms  max 7.0 ms  views: home'.format(
+            slow_queries.fingerprint('SELECT a FROM t WHERE id = 1'))))
+        self.assertEqual(lines[1].strip(), 'SELECT a FROM t WHERE id = ?')
+        self.assertEqual(lines[2].strip(), 'SCAN t')
+        self.assertTrue(lines[3].startswith('2. '))
+
+        out = StringIO()
+        call_command('slow_query_report', log=self.log, limit=1, json=True, stdout=out)
+        self.assertEqual([row['count'] for row in json.loads(out.getvalue())], [2])
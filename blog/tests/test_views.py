@@ -1,11 +1,18 @@
+import tempfile
 import time
-from django.test import Client, TestCase
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from pytils.translit import slugify
 
 
-from blog.models import Tag, Post
+from blog.models import Tag, Post, Comment
+from blog.pagination import CursorPaginator
+from blog.views import PostListView
 
 
 class TagListViewTests(TestCase):
@@ -36,6 +43,28 @@ class TagListViewTests(TestCase):
         self.assertContains(response, self.tag2.title)
         self.assertContains(response, self.tag3.title)
 
+    def test_tag_cloud_is_ordered_and_weighted_by_post_count(self):
+        user = get_user_model().objects.create_user(username='testuser', password='secret')
+        for i in range(20):
+            post = Post.objects.create(title='Post {}'.format(i), body='Content', author=user)
+            post.tags.add(self.tag2)
+            if i < 2:
+                post.tags.add(self.tag3)
+        Post.objects.create(title='Draft', body='Content', author=user, published=False).tags.add(self.tag1)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('tag_list'))
+        tags = response.context['tags']
+        self.assertEqual([(tag.title, tag.post_count) for tag in tags],
+                         [('tag2', 20), ('tag3', 2), ('tag1', 0)])
+        self.assertEqual([tag.weight for tag in tags], [5, 2, 1])
+        self.assertContains(response, 'class="tag-weight-5"')
+
+    @mock.patch('blog.views.TagListView.paginate_by', 2)
+    def test_tag_list_is_paginated(self):
+        response = self.client.get(reverse('tag_list'), {'page': 2})
+        self.assertEqual([tag.title for tag in response.context['tags']], ['tag3'])
+
 
 class PostCreateViewTests(TestCase):
     def setUp(self):
@@ -194,6 +223,12 @@ class PostUpdateViewTests(TestCase):
         response = self.client.get(reverse('post_edit', args=[self.post.slug]))
         self.assertEqual(response.status_code, 403)
 
+    def test_post_is_loaded_once(self):
+        self.client.login(username='author', password='secret')
+        # session, user, post with author, post tags, tag choices
+        with self.assertNumQueries(5):
+            self.client.get(reverse('post_edit', args=[self.post.slug]))
+
     def test_update_post_by_author(self):
         data = {'title': 'Post edited by author',
                 'body': 'Edited content',
@@ -325,6 +360,11 @@ class PostDeleteViewTests(TestCase):
         response = self.client.get(reverse('post_delete', args=[self.post.slug]))
         self.assertEqual(response.status_code, 403)
 
+    def test_post_is_loaded_once(self):
+        self.client.login(username='author', password='secret')
+        with self.assertNumQueries(3):
+            self.client.get(reverse('post_delete', args=[self.post.slug]))
+
     def test_delete_post_by_author(self):
         posts = Post.objects.all()
         self.assertEqual(posts.count(), 1)
@@ -395,6 +435,13 @@ class PostDetailViewTests(TestCase):
         self.assertContains(response, 'Edit Post')
         self.assertContains(response, 'Delete Post')
 
+    def test_post_is_loaded_once(self):
+        self.client.login(username='testuser', password='secret')
+        # validators, session, user, post with author, comments, related posts
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('post_detail', args=[self.post.slug]))
+        self.assertEqual(response.context['post'], self.post)
+
     def test_comment_create_by_anonymous_user(self):
         post = self.post
         data = {'name': 'tester',
@@ -451,11 +498,85 @@ class PostDetailViewTests(TestCase):
         self.assertEqual(comment.body, 'some text')
         self.assertEqual(comment.author_status, 'staff')
 
+    def create_comments(self, count):
+        for number in range(count):
+            Comment.objects.create(post=self.post, name='reader', email='reader@test.com',
+                                   body='Comment number {}'.format(number))
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_comments_are_paginated(self):
+        self.create_comments(25)
+        Comment.objects.create(post=self.post, name='spammer', email='spam@test.com',
+                               body='Hidden comment', active=False)
+        response = self.client.get(reverse('post_detail', args=[self.post.slug]))
+        page = response.context['comments']
+        self.assertEqual([comment.body for comment in page],
+                         ['Comment number {}'.format(number) for number in range(20)])
+        self.assertContains(response, 'More comments')
+
+        url = reverse('post_comments', args=[self.post.slug])
+        response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertTemplateUsed(response, 'partials/_comments.html')
+        self.assertContains(response, 'Comment number 24')
+        self.assertNotContains(response, 'Comment number 19')
+        self.assertNotContains(response, 'Hidden comment')
+        self.assertNotContains(response, 'More comments')
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_comments_json_fragment(self):
+        self.create_comments(21)
+        url = reverse('post_comments', args=[self.post.slug])
+        data = self.client.get(url, {'format': 'json'}).json()
+        self.assertIn('Comment number 19', data['html'])
+        self.assertIn('More comments', data['html'])
+
+        data = self.client.get(url, {'format': 'json', 'cursor': data['next_cursor']}).json()
+        self.assertIn('Comment number 20', data['html'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_reply_to_comment(self):
+        self.create_comments(2)
+        first, second = Comment.objects.filter(post=self.post)
+        response = self.client.post(reverse('post_detail', args=[self.post.slug]),
+                                    {'name': 'tester', 'email': 'test@test.com',
+                                     'body': 'A reply', 'parent': first.pk})
+        self.assertEqual(response.status_code, 302)
+        reply = Comment.objects.get(body='A reply')
+        self.assertEqual(reply.parent, first)
+
+        response = self.client.get(reverse('post_detail', args=[self.post.slug]))
+        self.assertEqual(list(response.context['comments']), [first, reply, second])
+
+    def test_reply_to_comment_of_another_post_fails(self):
+        other = Post.objects.create(title='Other post', body='Other content', author=self.author)
+        comment = Comment.objects.create(post=other, name='reader', email='reader@test.com', body='Hi')
+        response = self.client.post(reverse('post_detail', args=[self.post.slug]),
+                                    {'name': 'tester', 'email': 'test@test.com',
+                                     'body': 'A reply', 'parent': comment.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Comment.objects.filter(body='A reply').exists())
+
+    def test_reply_link_fills_parent(self):
+        self.create_comments(1)
+        comment = Comment.objects.get(post=self.post)
+        self.client.login(username='testuser', password='secret')
+        response = self.client.get(reverse('post_detail', args=[self.post.slug]), {'reply_to': comment.pk})
+        self.assertContains(response, '?reply_to={}#comment-form'.format(comment.pk))
+        self.assertContains(response, 'name="parent" value="{}"'.format(comment.pk))
+
+    def test_new_comment_invalidates_comment_pages(self):
+        self.create_comments(1)
+        url = reverse('post_comments', args=[self.post.slug])
+        self.client.get(url)
+        self.create_comments(1)
+        self.assertContains(self.client.get(url), 'Comment number 0', count=2)
+
 
 class PostListViewTests(TestCase):
 
     def setUp(self):
         self.client = Client()
+        cache.clear()
 
         self.author = get_user_model().objects.create_user(
             username='author',
@@ -543,6 +664,44 @@ class PostListViewTests(TestCase):
         self.assertNotContains(response, self.post1.title)
         self.assertNotContains(response, self.post4.title)
 
+    def titles(self, response):
+        return [post.title for post in response.context['posts']]
+
+    def test_tag_filter_skips_drafts(self):
+        Post.objects.create(title='Draft', body='Draft', author=self.author, published=False).tags.add(self.tag1)
+        response = self.client.get(reverse('tag_detail', args=['tag1']))
+        self.assertEqual(self.titles(response), ['Post 3', 'Post 2'])
+
+    def test_filter_posts_by_all_tags(self):
+        response = self.client.get(reverse('tag_detail', args=['tag1+tag2']))
+        self.assertEqual(self.titles(response), ['Post 3'])
+        self.assertFalse(response.context['tag_detail'])
+        response = self.client.get(reverse('home'), {'tags': 'tag2 tag1'})
+        self.assertEqual(self.titles(response), ['Post 3'])
+
+    def test_filter_posts_by_any_tag(self):
+        self.post4.tags.add(self.tag2)
+        response = self.client.get(reverse('tag_detail', args=['tag1,tag2']))
+        self.assertEqual(self.titles(response), ['Post 4', 'Post 3', 'Post 2'])
+        response = self.client.get(reverse('home'), {'tags': 'tag1,tag2'})
+        self.assertEqual(self.titles(response), ['Post 4', 'Post 3', 'Post 2'])
+
+    def test_unknown_tag_in_filter_is_404(self):
+        self.assertEqual(self.client.get(reverse('tag_detail', args=['nope+tag1'])).status_code, 404)
+
+    def test_tag_paths_redirect_to_canonical_path(self):
+        response = self.client.get(reverse('tag_detail', args=['Tag2+TAG1']), {'page': 2})
+        self.assertRedirects(response, reverse('tag_detail', args=['tag1+tag2']) + '?page=2',
+                             status_code=301, fetch_redirect_response=False)
+        response = self.client.get(reverse('tag_detail', args=['Tag1']))
+        self.assertRedirects(response, reverse('tag_detail', args=['tag1']), status_code=301)
+
+    def test_combined_tag_page_goes_stale_with_its_tags(self):
+        url = reverse('tag_detail', args=['tag1+tag2'])
+        self.assertEqual(self.titles(self.client.get(url)), ['Post 3'])
+        self.post4.tags.set([self.tag1, self.tag2])
+        self.assertContains(self.client.get(url), 'Post 4')
+
     def test_filter_posts_by_author(self):
         response = self.client.get(reverse('posts_by_author', args=[self.author.username]))
         self.assertEqual(response.status_code, 200)
@@ -561,6 +720,158 @@ class PostListViewTests(TestCase):
         self.assertNotContains(response, self.post3.title)
         self.assertNotContains(response, self.post4.title)
 
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_query_count_does_not_grow_with_page_size(self):
+        for i in range(10):
+            post = Post.objects.create(
+                title='Extra post {}'.format(i),
+                body='Extra content',
+                author=self.user if i % 2 else self.author
+            )
+            post.tags.set([self.tag1, self.tag2])
+            Comment.objects.create(post=post, name='tester',
+                                   email='test@test.com', body='Comment')
+
+        def count_queries(page_size):
+            with mock.patch.object(PostListView, 'paginate_by', page_size):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse('home'))
+            self.assertEqual(len(response.context['posts']), page_size)
+            return len(queries)
+
+        self.client.get(reverse('home'))
+        self.assertEqual(count_queries(2), count_queries(10))
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_posts_count_is_cached(self):
+        self.client.get(reverse('home'))
+        Post.objects.filter(pk=self.post1.pk).update(published=False)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['posts_count'], 4)
+
+        Post.objects.create(title='Post 5', body='Flask', author=self.author)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['posts_count'],
+                         Post.objects.filter(published=True).count())
+
+    def test_single_count_query_per_request(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'), {'page': 2})
+        counts = [q for q in queries.captured_queries if 'COUNT(*)' in q['sql']]
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(response.context['page'].number, 2)
+        self.assertIs(response.context['page'], response.context['page_obj'])
+
+    def test_pagination_renders_page_window(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['page'].window, [1, 2])
+        self.assertContains(response, 'href="?page=2"')
+
+    def test_invalid_page_falls_back_to_last_page(self):
+        response = self.client.get(reverse('home'), {'page': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page'].number, 2)
+        self.assertContains(response, self.post1.title)
+
+    def test_cursor_pagination(self):
+        response = self.client.get(reverse('home'), {'cursor': ''})
+        page = response.context['page']
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertEqual(list(page), [self.post4, self.post3, self.post2])
+        self.assertFalse(page.has_previous())
+        self.assertContains(response, '?cursor=' + page.next_cursor)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'), {'cursor': page.next_cursor})
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(*)' in q['sql']])
+        self.assertFalse([q for q in queries.captured_queries if 'OFFSET' in q['sql']])
+        page = response.context['page']
+        self.assertEqual(list(page), [self.post1])
+        self.assertFalse(page.has_next())
+
+        response = self.client.get(reverse('home'), {'cursor': page.previous_cursor})
+        page = response.context['page']
+        self.assertEqual(list(page), [self.post4, self.post3, self.post2])
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_cursor_pagination_opt_in(self):
+        with mock.patch.object(PostListView, 'cursor_pagination', True):
+            response = self.client.get(reverse('tag_detail', args=['tag1']))
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertEqual(list(response.context['page']), [self.post3, self.post2])
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('home'), {'cursor': 'garbage!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page']), [self.post4, self.post3, self.post2])
+
+    def test_cursor_pages_are_index_ranges(self):
+        paginator = CursorPaginator(Post.objects.filter(published=True), 2)
+        values = [self.post3.created, self.post3.pk]
+        plan = paginator.queryset.filter(paginator._seek(values, False)).explain()
+        self.assertIn('created<?', plan)
+        plan = paginator.queryset.filter(paginator._seek(values, True)).explain()
+        self.assertIn('created>?', plan)
+
+    def test_feed_does_not_load_post_bodies(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+        self.assertFalse([q for q in queries.captured_queries if '"blog_post"."body' in q['sql']])
+        self.assertContains(response, self.post4.excerpt)
+
+    def test_post_cards_are_cached_by_version(self):
+        self.client.get(reverse('home'))
+        Post.objects.filter(pk=self.post4.pk).update(title='Stale title')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Post 4')
+        self.assertNotContains(response, 'Stale title')
+
+        post = Post.objects.get(pk=self.post4.pk)
+        post.title = 'Fresh title'
+        post.save()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Fresh title')
+
+    def test_post_card_version_bumped_by_tags_and_comments(self):
+        self.client.get(reverse('home'))
+        self.post4.tags.add(self.tag2)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '<a href="{}">'.format(self.tag2.get_absolute_url()), count=2)
+
+        Comment.objects.create(post=self.post4, name='tester',
+                               email='test@test.com', body='Comment')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Comments: <span class="red">1</span>')
+
+        self.tag2.title = 'renamed'
+        self.tag2.save()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '>renamed</a>', count=2)
+
+    def test_post_cards_with_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            caches = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}
+            with override_settings(CACHES=caches):
+                self.client.get(reverse('home'))
+                Post.objects.filter(pk=self.post4.pk).update(title='Stale title')
+                response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Post 4')
+
+    def test_comment_count_includes_only_active_comments(self):
+        Comment.objects.create(post=self.post4, name='tester',
+                               email='test@test.com', body='Active')
+        Comment.objects.create(post=self.post4, name='tester',
+                               email='test@test.com', body='Hidden',
+                               active=False)
+        response = self.client.get(reverse('home'))
+        post = [p for p in response.context['posts'] if p == self.post4][0]
+        self.assertEqual(post.comment_count, 1)
+
 
 class TagViewTests(TestCase):
 
@@ -655,6 +966,12 @@ class TagViewTests(TestCase):
         self.assertFalse(Tag.objects.filter(title__exact='tag1').first())
         self.assertEqual(Tag.objects.count(), 1)
 
+    def test_tag_is_loaded_once(self):
+        self.client.login(username='admin', password='supersecret')
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('tag_edit', args=[self.tag1.slug]))
+        self.assertEqual(response.context['obj'], self.tag1)
+
     def test_create_tag_without_title_fails(self):
         self.client.login(username='testuser', password='secret')
         response = self.client.post(reverse('tag_new'))
@@ -694,3 +1011,192 @@ class TagViewTests(TestCase):
         response = self.client.post(reverse('tag_edit', args=[self.tag1.slug]), data)
         self.assertEqual(response.status_code, 200)
         self.assertTrue(Tag.objects.filter(title__exact='tag1').first())
+
+
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        self.author = get_user_model().objects.create_user(
+            username='author',
+            email='author@email.com',
+            password='secret'
+        )
+        self.tag1 = Tag.objects.create(title='tag1')
+        self.tag2 = Tag.objects.create(title='tag2')
+        self.post = Post.objects.create(
+            title='Cached post',
+            body='Cached content',
+            author=self.author
+        )
+        self.post.tags.set([self.tag1])
+        self.other = Post.objects.create(
+            title='Other post',
+            body='Other content',
+            author=self.author
+        )
+        self.other.tags.set([self.tag2])
+
+    def test_anonymous_pages_are_cached(self):
+        for url in [reverse('home'), reverse('post_detail', args=[self.post.slug]),
+                    reverse('tag_detail', args=['tag1']),
+                    reverse('posts_by_author', args=['author'])]:
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, self.post.title)
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('home'), {'search': 'other'})
+        self.assertContains(response, self.other.title)
+        self.assertNotContains(response, self.post.title)
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.login(username='author', password='secret')
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('home'))
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'New Post')
+
+    def test_comment_invalidates_post_and_feed_pages(self):
+        detail = reverse('post_detail', args=[self.post.slug])
+        self.client.get(detail)
+        self.client.get(reverse('home'))
+        self.client.post(detail, {'name': 'tester', 'email': 'test@test.com',
+                                  'body': 'Fresh comment'})
+        self.assertContains(self.client.get(detail), 'Fresh comment')
+        self.assertContains(self.client.get(reverse('home')),
+                            'Comments: <span class="red">1</span>')
+
+    def test_post_delete_invalidates_pages_once(self):
+        for i in range(5):
+            Comment.objects.create(post=self.post, name='tester', email='test@test.com',
+                                   body='Comment {}'.format(i))
+        with mock.patch('blog.signals.invalidate_paths') as invalidate_paths:
+            self.post.delete()
+        self.assertEqual(invalidate_paths.call_count, 1)
+        self.assertFalse(Comment.objects.exists())
+
+        comment = Comment.objects.create(post=self.other, name='tester', email='test@test.com', body='Kept')
+        with mock.patch('blog.signals.invalidate_paths') as invalidate_paths:
+            comment.delete()
+        self.assertEqual(invalidate_paths.call_count, 1)
+
+    def test_post_edit_invalidates_only_affected_pages(self):
+        self.client.get(reverse('tag_detail', args=['tag1']))
+        self.client.get(reverse('tag_detail', args=['tag2']))
+        old_url = reverse('post_detail', args=[self.post.slug])
+        self.client.get(old_url)
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.title = 'Renamed post'
+        post.save()
+
+        self.assertContains(self.client.get(reverse('tag_detail', args=['tag1'])), 'Renamed post')
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('tag_detail', args=['tag2']))
+
+    def test_cached_page_has_valid_csrf_token_for_each_reader(self):
+        detail = reverse('post_detail', args=[self.post.slug])
+        first = Client(enforce_csrf_checks=True)
+        second = Client(enforce_csrf_checks=True)
+        first.get(detail)
+        response = second.get(detail)
+        self.assertNotContains(response, 'csrf-token-placeholder')
+        token = response.content.decode().split('name="csrfmiddlewaretoken" value="')[1].split('"')[0]
+
+        response = second.post(detail, {'name': 'tester', 'email': 'test@test.com',
+                                        'body': 'Comment', 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        self.author = get_user_model().objects.create_user(
+            username='author',
+            email='author@email.com',
+            password='secret'
+        )
+        self.tag = Tag.objects.create(title='tag1')
+        self.post = Post.objects.create(
+            title='Conditional post',
+            body='Conditional content',
+            author=self.author
+        )
+        self.post.tags.set([self.tag])
+        self.detail = reverse('post_detail', args=[self.post.slug])
+
+    def assertNotModified(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        return response
+
+    def test_pages_send_validators(self):
+        for url in [self.detail, reverse('home'), reverse('tag_detail', args=['tag1']),
+                    reverse('posts_by_author', args=['author'])]:
+            response = self.client.get(url)
+            self.assertTrue(response.has_header('ETag'))
+            self.assertTrue(response.has_header('Last-Modified'))
+            self.assertNotModified(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertNotModified(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+    def test_comment_changes_detail_etag(self):
+        etag = self.client.get(self.detail)['ETag']
+        self.post.comments.create(name='tester', email='test@test.com', body='New comment')
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'New comment')
+
+    def test_feed_etag_follows_edits_and_deletes(self):
+        home = reverse('home')
+        etag = self.client.get(home)['ETag']
+        post = Post.objects.get(pk=self.post.pk)
+        post.title = 'Edited post'
+        post.save()
+        response = self.client.get(home, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Edited post')
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(home, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        post.delete()
+        self.assertEqual(self.client.get(home, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_feed_validators_do_not_query_the_feed(self):
+        home = reverse('home')
+        etag = self.client.get(home, {'cursor': ''})['ETag']
+        with self.assertNumQueries(0):
+            self.assertNotModified(home + '?cursor=', HTTP_IF_NONE_MATCH=etag)
+        Post.objects.create(title='Second post', body='Content', author=self.author)
+        self.assertEqual(self.client.get(home + '?cursor=', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_comment_edit_changes_detail_etag(self):
+        comment = self.post.comments.create(name='tester', email='test@test.com', body='Old text')
+        etag = self.client.get(self.detail)['ETag']
+        comment.body = 'New text'
+        comment.save()
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'New text')
+
+    def test_etag_depends_on_user(self):
+        etag = self.client.get(self.detail)['ETag']
+        self.client.login(username='author', password='secret')
+        self.assertEqual(self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=60)
+    def test_page_cache_hit_answers_without_queries(self):
+        etag = self.client.get(self.detail)['ETag']
+        with self.assertNumQueries(0):
+            self.assertNotModified(self.detail, HTTP_IF_NONE_MATCH=etag)
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+
+_local = threading.local()
+
+
+class RequestTimings:
+    # Time spent in SQL and in template rendering during one request.
+    # Template time excludes the queries run while rendering, so the two
+    # can be subtracted from the total to get the time spent in Python.
+
+    def __init__(self, keep_sql=True):
+        self.keep_sql = keep_sql
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.sql = []
+        self._rendering = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Used as a connection.execute_wrapper().
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if self.keep_sql:
+                self.sql.append((elapsed, sql))
+
+    def render(self, render):
+        # Nested renders (render_to_string from a template tag) are already
+        # part of the outer one.
+        if self._rendering:
+            return render()
+        self._rendering += 1
+        started, db_time = time.perf_counter(), self.db_time
+        try:
+            return render()
+        finally:
+            self._rendering -= 1
+            self.template_time += time.perf_counter() - started - (self.db_time - db_time)
+
+
+def current_timings():
+    return getattr(_local, 'timings', None)
+
+
+def activate(timings):
+    _local.timings = timings
+
+
+def deactivate():
+    _local.timings = None
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        timings = current_timings()
+        if timings is None:
+            return super().render(context, request)
+        return timings.render(lambda: super(TimedTemplate, self).render(context, request))
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    # The Django template backend, with renders counted towards the
+    # RequestTimings of the current request.
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
@@ -6,6 +6,7 @@ urlpatterns = [
     path('post/<str:slug>/delete/', views.PostDeleteView.as_view(), name='post_delete'),
     path('post/<str:slug>/edit/', views.PostUpdateView.as_view(), name='post_edit'),
     path('post/new/', views.PostCreateView.as_view(), name='post_new'),
+    path('post/<str:slug>/comments/', views.PostCommentsView.as_view(), name='post_comments'),
     path('post/<str:slug>/', views.PostDetailView.as_view(), name='post_detail'),
     path('posts/by/<str:author>/', views.PostListView.as_view(), name='posts_by_author'),
     path('', views.PostListView.as_view(), name='home'),
@@ -14,4 +15,5 @@ urlpatterns = [
     path('tag/new/', views.TagView.as_view(), name='tag_new'),
     path('tags/', views.TagListView.as_view(), name='tag_list'),
     path('tag/<str:slug>/', views.PostListView.as_view(), name='tag_detail'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ]
@@ -0,0 +1,38 @@
+from django.utils import timezone
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+
+EXCERPT_WORDS = 15
+
+
+def render_body(body):
+    # Same output as the |linebreaks filter with autoescaping on.
+    return linebreaks(body, autoescape=True)
+
+
+def make_excerpt(body):
+    # Same output as the |truncatewords filter.
+    return Truncator(body).words(EXCERPT_WORDS, truncate=' …')
+
+
+def render_post_bodies(post_model, batch_size=500):
+    rendered = 0
+    last_pk = 0
+    while True:
+        posts = list(post_model.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .only('pk', 'body', 'body_html', 'excerpt')[:batch_size])
+        if not posts:
+            return rendered
+        # Bumping updated refreshes the cached cards and the ETags, so only
+        # the posts whose rendering really changed are written.
+        now = timezone.now()
+        changed = []
+        for post in posts:
+            body_html, excerpt = render_body(post.body), make_excerpt(post.body)
+            if (body_html, excerpt) != (post.body_html, post.excerpt):
+                post.body_html, post.excerpt, post.updated = body_html, excerpt, now
+                changed.append(post)
+        post_model.objects.bulk_update(changed, ['body_html', 'excerpt', 'updated'])
+        rendered += len(posts)
+        last_pk = posts[-1].pk
@@ -1,68 +1,188 @@
+import datetime
+import math
+import re
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.views.generic import ListView, DetailView, FormView
+from django.views.generic import ListView, DetailView, FormView, View
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy, reverse
+from django.utils.http import urlencode
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import QuerySet
 
 
-from .models import Post, Tag
+from . import metrics, search
+from .cache import AnonymousPageCacheMixin, ConditionalGetMixin, page_version
+from .models import Post, RelatedPost, Tag
+from .pagination import CursorPaginator, WindowedPaginator
+from .popularity import CountViewsMixin, popularity_version
 from .forms import CommentForm, PostForm, TagForm
 
 
-class PostListView(ListView):
+COMMENTS_PER_PAGE = 20
+
+
+def comments_page(post, cursor=None):
+    # Keyset pages over the materialized path: threads come in reading order
+    # with their replies, from one range scan of the (post, active, path) index.
+    comments = post.comments.filter(active=True)
+    return CursorPaginator(comments, COMMENTS_PER_PAGE, ordering=('path',)).page(cursor)
+
+
+class PostListView(AnonymousPageCacheMixin, ConditionalGetMixin, ListView):
     paginate_by = 3
+    paginator_class = WindowedPaginator
+    cursor_pagination = False
+    cursor_ordering = ('-created', '-id')
+    orderings = {'popular': ('-popularity', '-id')}
     template_name = 'home.html'
     context_object_name = 'posts'
 
-    def get_queryset(self):
-        queryset = Post.objects.filter(published=True)
-        if 'slug' in self.kwargs:
-            tag = get_object_or_404(Tag, slug__iexact=self.kwargs['slug'])
-            queryset = tag.posts.all()
+    def dispatch(self, request, *args, **kwargs):
+        # Invalidation only knows the canonical path of a tag page (lowercase,
+        # sorted slugs), so other spellings redirect there instead of being
+        # cached under a path that never goes stale.
+        if 'slug' in kwargs:
+            slugs, match_all = self.get_tag_filter()
+            canonical = ('+' if match_all else ',').join(slugs)
+            if slugs and canonical != kwargs['slug']:
+                url = reverse('tag_detail', args=[canonical])
+                if request.META.get('QUERY_STRING'):
+                    url += '?' + request.META['QUERY_STRING']
+                return redirect(url, permanent=True)
+        return super(PostListView, self).dispatch(request, *args, **kwargs)
+
+    def get_feed_queryset(self):
+        if hasattr(self, '_feed_queryset'):
+            return self._feed_queryset
 
-        if 'search' in self.request.GET:
-            queryset = Post.objects.filter(Q(title__icontains=self.request.GET['search']) |
-                                        Q(body__icontains=self.request.GET['search']),
-                                        published=True)
+        queryset = Post.objects.filter(published=True)
+        slugs, match_all = self.get_tag_filter()
+        if slugs:
+            tags = list(Tag.objects.filter(slug__in=slugs).values_list('pk', flat=True))
+            if len(tags) != len(slugs):
+                raise Http404('No tag matches the given query.')
+            queryset = Post.tagged(tags, match_all)
 
         if 'author' in self.kwargs:
             user = get_object_or_404(User, username=self.kwargs['author'])
             queryset = user.posts.filter(published=True)
+
+        self._feed_queryset = queryset
         return queryset
 
+    def get_tag_filter(self):
+        # "a+b" (or "a b" once a query string is decoded) matches posts with
+        # all the tags, "a,b" posts with any of them.
+        value = self.kwargs.get('slug') or self.request.GET.get('tags') or ''
+        if ',' in value:
+            slugs, match_all = value.split(','), False
+        else:
+            slugs, match_all = re.split(r'[+\s]', value), True
+        return sorted({slug.strip().lower() for slug in slugs if slug.strip()}), match_all
+
+    def get_page_version(self, request):
+        # Combined tag pages are never invalidated by path themselves, so they
+        # go stale with any of their tags.
+        slugs, match_all = self.get_tag_filter()
+        if 'slug' in self.kwargs and len(slugs) > 1:
+            return max(page_version(reverse('tag_detail', args=[slug])) for slug in slugs)
+        return super(PostListView, self).get_page_version(request)
+
+    def get_order(self):
+        order = self.request.GET.get('order')
+        return order if order in self.orderings else None
+
+    def get_ordering(self):
+        return self.orderings.get(self.get_order())
+
+    def get_validators(self):
+        # The signals bump the page version of every feed a changed post is
+        # listed in, so no query over the feed is needed. Search results
+        # follow from the same posts.
+        versions = [self.get_page_version(self.request)]
+        if self.get_order() == 'popular':
+            versions.append(popularity_version())
+        etag = self.get_etag(*versions, Post.published_count())
+        return etag, datetime.datetime.fromtimestamp(max(versions), datetime.timezone.utc)
+
+    def get_queryset(self):
+        queryset = self.get_feed_queryset()
+        queryset = queryset.select_related('author').prefetch_related('tags').defer('body', 'body_html')
+        if self.get_ordering():
+            queryset = queryset.order_by(*self.get_ordering())
+
+        if search.tokenize(self.request.GET.get('search')):
+            ids = search.search(self.request.GET['search'], search.RESULTS_LIMIT + 1)
+            return search.SearchResults(ids, queryset)
+        return queryset
+
+    def use_cursor_pagination(self):
+        return ((self.cursor_pagination or 'cursor' in self.request.GET)
+                and isinstance(self.object_list, QuerySet))
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.use_cursor_pagination():
+            paginator = CursorPaginator(queryset, page_size, self.get_ordering() or self.cursor_ordering)
+            page = paginator.page(self.request.GET.get('cursor'))
+            return paginator, page, page.object_list, page.has_other_pages()
+
+        paginator = self.get_paginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get(self.page_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, *args, **kwargs):
         context = super(PostListView, self).get_context_data(*args, **kwargs)
-        context['tag_slug'] = self.kwargs.get('slug')
+        slugs, match_all = self.get_tag_filter()
+        context['tag_slug'] = slugs[0] if 'slug' in self.kwargs and len(slugs) == 1 else None
         context['tag_detail'] = False
-        posts = self.get_queryset()
-        paginator = Paginator(posts, 3)
-        page_number = self.request.GET.get('page', 1)
-        context['page'] = paginator.get_page(page_number)
-        context['posts_count'] = len(posts)
+        context['page_query'] = urlencode([(name, self.request.GET[name])
+                                           for name in ('search', 'tags', 'order') if self.request.GET.get(name)])
+        context['page'] = context['page_obj']
+        context['cursor_pagination'] = self.use_cursor_pagination()
+        context['order'] = self.get_order()
+        context['posts_count'] = Post.published_count()
+        context['search_limit'] = search.RESULTS_LIMIT
+        context['search_truncated'] = getattr(self.object_list, 'truncated', False)
         if context['tag_slug']:
             context['tag_detail'] = True
         return context
 
 
-class PostDetailView(DetailView):
-    model = Post
+class PostConditionalGetMixin(ConditionalGetMixin):
+
+    def get_validators(self):
+        post = (self.get_queryset().filter(slug=self.kwargs['slug'])
+                .values('updated', 'comment_count').first())
+        if post is None:
+            return None, None
+        return self.get_etag(post['updated'].isoformat(), post['comment_count']), post['updated']
+
+
+class PostDetailView(CountViewsMixin, AnonymousPageCacheMixin, PostConditionalGetMixin, DetailView):
+    queryset = Post.objects.select_related('author').defer('body')
     context_object_name = 'post'
     template_name = 'post_detail.html'
 
     def get_context_data(self, *args, **kwargs):
         context = super(PostDetailView, self).get_context_data(*args, **kwargs)
-        context['comment_form'] = CommentForm(**{'user': self.request.user})
-        context['comments'] = self.get_object().comments.filter(active=True)
+        context['comment_form'] = CommentForm(initial={'parent': self.request.GET.get('reply_to')},
+                                              **{'user': self.request.user})
+        context['comments'] = comments_page(self.object)
+        context['related_posts'] = (RelatedPost.objects
+                                    .filter(post=self.object, related__published=True)
+                                    .select_related('related')
+                                    .only('related__title', 'related__slug'))
         context['detail'] = True
         return context
 
     def post(self, request, *args, **kwargs):
-        post = self.get_object()
-        form = CommentForm(data=request.POST, **{'user': request.user})
+        post = self.object = self.get_object()
+        form = CommentForm(data=request.POST, **{'user': request.user, 'post': post})
         if form.is_valid():
             new_comment = form.save(commit=False)
             new_comment.post = post
@@ -77,15 +197,36 @@ class PostDetailView(DetailView):
                     new_comment.author_status = 'user'
 
             new_comment.save()
+            metrics.comments_submitted.inc(result='accepted')
             return redirect(reverse('post_detail', args=[post.slug]))
         else:
+            metrics.comments_submitted.inc(result='invalid')
             return render(request, 'post_detail.html',
                           {'post': post,
-                           'comments': post.comments.filter(active=True),
+                           'comments': comments_page(post),
                            'comment_form': form,
                            'detail': True})
 
 
+class PostCommentsView(AnonymousPageCacheMixin, PostConditionalGetMixin, DetailView):
+    queryset = Post.objects.only('id', 'slug')
+    context_object_name = 'post'
+    template_name = 'partials/_comments.html'
+
+    def get_context_data(self, *args, **kwargs):
+        context = super(PostCommentsView, self).get_context_data(*args, **kwargs)
+        context['comments'] = comments_page(self.object, self.request.GET.get('cursor'))
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') == 'json':
+            return JsonResponse({
+                'html': render_to_string(self.template_name, context, self.request),
+                'next_cursor': context['comments'].next_cursor,
+            })
+        return super(PostCommentsView, self).render_to_response(context, **response_kwargs)
+
+
 class PostCreateView(LoginRequiredMixin, CreateView):
     form_class = PostForm
     template_name = 'form.html'
@@ -97,46 +238,64 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class PostUpdateView(LoginRequiredMixin, UpdateView):
-    model = Post
-    form_class = PostForm
-    template_name = 'form.html'
-    login_url = 'login'
-    extra_context = {'update': True, 'object_name': 'Post'}
+class PostOwnerMixin:
+    queryset = Post.objects.select_related('author')
+
+    def get_object(self, queryset=None):
+        # Loaded once for the permission check and reused by the generic view.
+        if not hasattr(self, '_object'):
+            self._object = super().get_object(queryset)
+        return self._object
 
     def dispatch(self, request, *args, **kwargs):
         obj = self.get_object()
         if not self.request.user.is_staff:
-            if obj.author != self.request.user:
+            if obj.author_id != self.request.user.pk:
                 raise PermissionDenied
 
         return super().dispatch(request, *args, **kwargs)
 
 
-class PostDeleteView(LoginRequiredMixin, DeleteView):
+class PostUpdateView(PostOwnerMixin, LoginRequiredMixin, UpdateView):
     model = Post
+    form_class = PostForm
     template_name = 'form.html'
-    success_url = reverse_lazy('home')
     login_url = 'login'
-    extra_context = {'delete': True, 'object_name': 'Post'}
+    extra_context = {'update': True, 'object_name': 'Post'}
 
-    def dispatch(self, request, *args, **kwargs):
-        obj = self.get_object()
-        if not self.request.user.is_staff:
-            if obj.author != self.request.user:
-                raise PermissionDenied
 
-        return super().dispatch(request, *args, **kwargs)
+class PostDeleteView(PostOwnerMixin, LoginRequiredMixin, DeleteView):
+    model = Post
+    template_name = 'form.html'
+    success_url = reverse_lazy('home')
+    login_url = 'login'
+    extra_context = {'delete': True, 'object_name': 'Post'}
 
 
 class TagListView(ListView):
     model = Tag
+    ordering = ('-post_count', 'title')
+    paginate_by = 100
+    paginator_class = WindowedPaginator
+    cloud_weights = 5
     template_name = 'tag_list.html'
     context_object_name = 'tags'
 
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get(self.page_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, *args, **kwargs):
         context = super(TagListView, self).get_context_data(*args, **kwargs)
         context['tag_list'] = True
+        context['page'] = context['page_obj']
+        tags = list(context['tags'])
+        # Log scale, so a few huge tags do not flatten the rest of the cloud.
+        most = max([tag.post_count for tag in tags] + [1])
+        for tag in tags:
+            tag.weight = 1 + round((self.cloud_weights - 1) * math.log1p(tag.post_count) / math.log1p(most))
+        context['tags'] = tags
         return context
 
 
@@ -145,9 +304,14 @@ class TagView(LoginRequiredMixin, FormView):
     template_name = 'form.html'
     login_url = 'login'
 
+    def get_object(self):
+        if not hasattr(self, 'object'):
+            self.object = get_object_or_404(Tag, slug=self.kwargs.get('slug'))
+        return self.object
+
     def get_initial(self):
         if self.kwargs.get('slug'):
-            obj = get_object_or_404(Tag, slug=self.kwargs.get('slug'))
+            obj = self.get_object()
             self.initial = {'title': obj.title, 'obj': obj}
         return self.initial.copy()
 
@@ -192,3 +356,10 @@ class TagView(LoginRequiredMixin, FormView):
             if not self.request.user.is_staff:
                 raise PermissionDenied
         return super().dispatch(request, *args, **kwargs)
+
+
+class MetricsView(View):
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(metrics.render(metrics.gather()), content_type=self.content_type)
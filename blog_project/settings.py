@@ -33,6 +33,7 @@ ALLOWED_HOSTS = []
 INSTALLED_APPS = [
     'blog.apps.BlogConfig',
     'accounts.apps.AccountsConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -42,11 +43,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.middleware.MetricsMiddleware',
+    'blog.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blog.middleware.ProfilerMiddleware',
+    'blog.middleware.SlowQueryViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,7 +60,8 @@ ROOT_URLCONF = 'blog_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'blog.timing.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,6 +89,71 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# Page versions, invalidation and rebuild locks must be seen by every worker
+# process, so the default cache is shared through the file system. Set
+# BLOG_CACHE_BACKEND / BLOG_CACHE_LOCATION to use memcached or redis instead.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('BLOG_CACHE_BACKEND', 'blog.cache.AtomicFileBasedCache'),
+        'LOCATION': os.environ.get('BLOG_CACHE_LOCATION', os.path.join(BASE_DIR, 'var', 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Tests and benchmarks render pages from throwaway databases and clear the
+# cache, so they get a private in-memory cache instead of the shared one.
+BLOG_ISOLATED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+TEST_RUNNER = 'blog.test_runner.IsolatedCacheRunner'
+
+BLOG_PAGE_CACHE_TIMEOUT = 60 * 5
+BLOG_PAGE_CACHE_GRACE = 30
+BLOG_VIEWS_FLUSH_INTERVAL = 60
+BLOG_VIEWS_FLUSH_THRESHOLD = 100
+BLOG_TIMING_SAMPLE_RATE = 1.0
+BLOG_SLOW_REQUEST_MS = 500
+BLOG_SLOW_REQUEST_QUERIES = 50
+# A directory shared by all worker processes, so /metrics adds up the
+# metrics of every worker. None serves the metrics of this process only.
+BLOG_METRICS_DIR = None
+BLOG_METRICS_WRITE_INTERVAL = 1.0
+# Profiles of sampled requests slower than BLOG_PROFILE_SLOW_MS are kept in
+# BLOG_PROFILE_DIR, newest BLOG_PROFILE_KEEP only. None turns this off.
+BLOG_PROFILE_DIR = None
+BLOG_PROFILE_SAMPLE_RATE = 0.01
+BLOG_PROFILE_SLOW_MS = 1000
+BLOG_PROFILE_KEEP = 100
+# Statements slower than this are appended to BLOG_SLOW_QUERY_LOG (JSON
+# lines) with their query plan, see the slow_query_report command. None
+# turns this off, e.g. os.path.join(BASE_DIR, 'var', 'log', 'slow_queries.jsonl').
+BLOG_SLOW_QUERY_MS = 100
+BLOG_SLOW_QUERY_LOG = None
+
+
+# Logging
+# https://docs.djangoproject.com/en/2.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INFO logs a line with the timings of every sampled request.
+        'blog': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -126,4 +197,4 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
 LOGIN_REDIRECT_URL = 'home'
-LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'home'
@@ -4,6 +4,32 @@ $(document).ready(function () {
       	e.preventDefault();      	
 	});
 
+	function loadComments(link) {
+		if (link.data('loading')) return;
+		link.data('loading', true);
+		$.get(link.attr('href'), function(html) {
+			link.replaceWith(html);
+		});
+	}
+
+	$('#comments').on('click', '.load-comments', function(e) {
+		loadComments($(this));
+		e.preventDefault();
+	});
+
+	$('#comments').on('click', '.reply-comment', function(e) {
+		$('#comment-form input[name="parent"]').val($(this).data('comment'));
+		$('#comment-form textarea').focus();
+		e.preventDefault();
+	});
+
+	$(window).on('scroll', function() {
+		var link = $('.load-comments');
+		if (link.length && link.offset().top < $(window).scrollTop() + $(window).height() + 200) {
+			loadComments(link);
+		}
+	});
+
 	setTimeout(function(){		
 		$(".message").fadeOut('slow');
 	}, 5000);